@@ -1,10 +1,17 @@
 #!/usr/bin/env python
 
+import array
 import json
 import logging
+import math
 import threading
 import time
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from usblib import device_from_fd
 from usblib import shell_usbdevice
 from usblib import CP210xSerial
@@ -13,6 +20,13 @@ from usblib import CP210xSerial
 LOGGER = logging.getLogger(__name__)
 
 
+#: raw samples per bucket on the finest envelope level
+ENVELOPE_BASE = 4
+#: buckets of a level merged into one bucket of the next level
+ENVELOPE_FACTOR = 4
+#: number of envelope levels (zoom levels)
+ENVELOPE_LEVELS = 6
+
 # ----------------------------------------------------------------------------
 
 
@@ -40,14 +54,139 @@ def main(fd, debug=False):
         ser.close()
 
 
-def grab_data(ser):
+def _extend(buf, data):
+    # append to array("d"), no per-element loop for numpy arrays
+    if np is not None and isinstance(data, np.ndarray):
+        buf.frombytes(data.astype("d").tobytes())
+    elif isinstance(data, array.array):
+        buf.frombytes(data.tobytes())
+    else:
+        buf.extend(data)
+
+
+def _group(mins, maxs, sums, num):
+    # merge full groups of num entries, returns merged + remainder
+    full = len(mins) // num * num
+    if np is not None:
+        mins, maxs, sums = (np.asarray(a, dtype="d") for a in (mins, maxs, sums))
+        merged = (
+            mins[:full].reshape(-1, num).min(axis=1),
+            maxs[:full].reshape(-1, num).max(axis=1),
+            sums[:full].reshape(-1, num).sum(axis=1),
+        )
+    else:
+        merged = tuple(
+            array.array("d", (fn(a[i : i + num]) for i in range(0, full, num)))
+            for fn, a in ((min, mins), (max, maxs), (sum, sums))
+        )
+    # copy, views would pin the pending arrays
+    rest = tuple(array.array("d", a[full:].tobytes()) for a in (mins, maxs, sums))
+    return merged, rest
+
+
+class EnvelopePyramid:
+    """Incremental min/max/mean envelopes of a sample stream at several
+    zoom levels, for fast display of long captures.
+
+    Level i holds buckets of ``base * factor ** i`` samples, feed new
+    samples with :meth:`feed` (e.g. from :func:`grab_data`), query a
+    window with :meth:`window` for a target width, served from the
+    coarsest level that still has at least one bucket per pixel. Only
+    full buckets are stored, the newest samples (less than one bucket)
+    show up once the bucket is complete. Uses NumPy if available, else
+    :mod:`array`. Thread safe."""
+
+    def __init__(
+        self, base=ENVELOPE_BASE, factor=ENVELOPE_FACTOR, levels=ENVELOPE_LEVELS
+    ):
+        self.bucket_sizes = [base * factor**i for i in range(levels)]
+        self._group_sizes = [base] + [factor] * (levels - 1)
+        # per level: mins, maxs, sums of full buckets
+        self.levels = [tuple(array.array("d") for _ in range(3)) for _ in range(levels)]
+        # per level: input not yet merged into a full bucket
+        self._pending = [
+            tuple(array.array("d") for _ in range(3)) for _ in range(levels)
+        ]
+        self.num_samples = 0
+        #: sample index of first sample of each fed frame
+        self.frame_starts = array.array("Q")
+        self.lock = threading.Lock()
+
+    def feed(self, samples):
+        """Append a frame of samples (sequence of numbers)."""
+        samples = array.array("d", samples)
+        with self.lock:
+            self.frame_starts.append(self.num_samples)
+            self.num_samples += len(samples)
+
+            new = (samples, samples, samples)
+            for store, pending, num in zip(
+                self.levels, self._pending, self._group_sizes
+            ):
+                for buf, data in zip(pending, new):
+                    _extend(buf, data)
+                new, rest = _group(*pending, num)
+                for buf, data in zip(pending, rest):
+                    del buf[:]
+                    _extend(buf, data)
+                if not len(new[0]):
+                    break
+                for buf, data in zip(store, new):
+                    _extend(buf, data)
+
+    def _level_for(self, samples_per_pixel):
+        level = 0
+        for idx, size in enumerate(self.bucket_sizes):
+            if size <= samples_per_pixel:
+                level = idx
+        return level
+
+    def window(self, start, stop, width):
+        """Envelope of samples ``[start, stop)`` at about width pixels.
+
+        Returns ``(positions, mins, maxs, means)``, positions is the
+        sample index of each pixel, may be fewer than width pixels if
+        the level has less buckets in the window."""
+        width = max(1, int(width))
+        with self.lock:
+            level = self._level_for((stop - start) / float(width))
+            size = self.bucket_sizes[level]
+            mins, maxs, sums = self.levels[level]
+            first = max(0, start // size)
+            last = min(len(mins), int(math.ceil(stop / float(size))))
+            if last <= first:
+                return [], [], [], []
+
+            count = last - first
+            edges = sorted(set(first + i * count // width for i in range(width)))
+            if np is not None:
+                idx = np.asarray(edges) - first
+                mins = np.minimum.reduceat(np.frombuffer(mins, "d")[first:last], idx)
+                maxs = np.maximum.reduceat(np.frombuffer(maxs, "d")[first:last], idx)
+                sums = np.add.reduceat(np.frombuffer(sums, "d")[first:last], idx)
+                counts = np.diff(np.append(idx, count)) * size
+                return np.asarray(edges) * size, mins, maxs, sums / counts
+
+            bounds = list(zip(edges, edges[1:] + [last]))
+            return (
+                [i * size for i in edges],
+                [min(mins[i:j]) for i, j in bounds],
+                [max(maxs[i:j]) for i, j in bounds],
+                [sum(sums[i:j]) / ((j - i) * size) for i, j in bounds],
+            )
+
+
+# ----------------------------------------------------------------------------
+
+
+def grab_data(ser, header_timeout=30.0, stage=None):
     delay = 5000.0 / 1000.0
     header = None
     transfers = list()
 
-    LOGGER.info("Trying to grab header for 30 sec ...")
+    LOGGER.info("Trying to grab header for %s sec ...", header_timeout)
     try:
-        data = ser.read(16 * 1024, 30.0)
+        data = ser.read(16 * 1024, header_timeout)
         if data:
             text = data.decode("utf-8").strip()
             header = text.splitlines()
@@ -58,7 +197,7 @@ def grab_data(ser):
     while True:
         try:
             print("   Waiting", end="", flush=True)
-            while not ser._buf_in:
+            while not ser._buf_in and ser.is_open:
                 with ser._buf_in.changed:
                     notified = ser._buf_in.changed.wait(delay)
                     print(".", end="", flush=True)
@@ -66,6 +205,10 @@ def grab_data(ser):
                         continue
             print()
 
+            # port closed (e.g. replay finished), nothing left
+            if not ser._buf_in and not ser.is_open:
+                break
+
             # consume all to finish?
             # on mismatch?
 
@@ -84,7 +227,16 @@ def grab_data(ser):
                     rows.append((x, y))
 
             transfers.append({"meta": meta, "data": rows})
+            if stage is not None:
+                # processing stage, e.g. EnvelopePyramid
+                stage.feed([y for _, y in rows])
             LOGGER.info("Got record.")
+        except ValueError:
+            # truncated record at end of stream (closed port / replay)
+            if ser.is_open:
+                raise
+            LOGGER.warning("Incomplete record at end of stream.")
+            break
         except KeyboardInterrupt:
             break
 
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+
+import collections
+import gzip
+import logging
+import lzma
+import struct
+import threading
+import time
+
+from usblib import device_from_fd
+from usblib import CP210xSerial
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: index file magic, followed by compression method line
+INDEX_MAGIC = b"USBCAP1\n"
+#: per block: file offset, stream offset, compressed size, raw size,
+#: wall time of first and last transfer, compression level
+INDEX_ENTRY = struct.Struct("<QQIIddb")
+
+#: compression methods, levels from best to lightest
+#:   blocks are independent gzip members / xz streams, so the data files
+#:   are also readable with zcat / xzcat
+COMPRESSION_LEVELS = {
+    "gzip": (6, 3, 1, 0),
+    "xz": (6, 3, 0),
+}
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+#: seal a partial block after this time (sec), keeps files current
+DEFAULT_FLUSH_INTERVAL = 5.0
+#: blocks waiting for compression before switching to a lighter level
+BACKLOG_BLOCKS = 4
+#: max raw bytes waiting for compression, more is dropped
+DEFAULT_MAX_BACKLOG = 16 * 1024 * 1024
+
+# ----------------------------------------------------------------------------
+
+
+def compress_block(method, level, data):
+    if method == "gzip":
+        return gzip.compress(data, compresslevel=level)
+    return lzma.compress(data, preset=level)
+
+
+def decompress_block(method, data):
+    if method == "gzip":
+        return gzip.decompress(data)
+    return lzma.decompress(data)
+
+
+class CompressedCaptureSink(threading.Thread):
+    """Stream-compressing capture sink for long running dumps.
+
+    Register with :meth:`CP210xSerial.add_rx_sink` or use as output of
+    :meth:`CP210xSerial.read_dump_forever`. Data is collected into
+    blocks of block_size bytes (or sealed after flush_interval seconds)
+    which are compressed independently on this background thread, so
+    :meth:`write` never blocks the USB reader. If blocks queue up the
+    compression level is lowered step by step (raised again once the
+    backlog is gone), if max_backlog is exceeded data is dropped.
+
+    filename may contain a ``{}`` placeholder for the file index, each
+    data file gets an index (``<file>.idx``) with one entry per block
+    (offsets, sizes, wall clock times), see :func:`read_region`. Files
+    are rotated by compressed size (rotate_size) and/or age in seconds
+    (rotate_interval)."""
+
+    def __init__(
+        self,
+        filename="capture-{}.gz",
+        method="gzip",
+        block_size=DEFAULT_BLOCK_SIZE,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        rotate_size=None,
+        rotate_interval=None,
+        max_backlog=DEFAULT_MAX_BACKLOG,
+    ):
+        super(CompressedCaptureSink, self).__init__(daemon=True)
+        if method not in COMPRESSION_LEVELS:
+            raise ValueError("Unknown compression method: {}".format(method))
+        self.filename = filename
+        self.method = method
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.max_backlog = max_backlog
+
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        # current block: data, wall time first/last
+        self._block = bytearray()
+        self._block_times = None
+        self._t_block = None
+        #: sealed blocks waiting for compression (data, t_first, t_last)
+        self._queue = collections.deque()
+        self._queue_bytes = 0
+        self._closed = False
+        self._wall_offset = time.time() - time.monotonic()
+
+        self._level_idx = 0
+        self._fp = self._fp_idx = None
+        self._t_file = None
+        self._stream_offset = 0
+        self.files = list()
+
+        self.num_bytes = 0
+        self.num_compressed = 0
+        self.num_blocks = 0
+        self.num_dropped = 0
+        self.level_changes = 0
+
+        self.start()
+
+    @property
+    def level(self):
+        return COMPRESSION_LEVELS[self.method][self._level_idx]
+
+    # called by RX thread (or dump loop), never blocks on compression
+    def write(self, data, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        wall = timestamp + self._wall_offset
+        with self.lock:
+            if self._closed:
+                return
+            if not self._block:
+                self._block_times = [wall, wall]
+                self._t_block = time.monotonic()
+            self._block += data
+            self._block_times[1] = wall
+            self.num_bytes += len(data)
+            if len(self._block) >= self.block_size:
+                self._seal()
+
+    def flush(self):
+        """Seal the current block if older than flush_interval."""
+        with self.lock:
+            if self._block and self._block_due():
+                self._seal()
+
+    def _block_due(self):
+        return time.monotonic() - self._t_block >= self.flush_interval
+
+    def _seal(self):
+        # lock held
+        block, (t_first, t_last) = bytes(self._block), self._block_times
+        self._block = bytearray()
+        if self._queue_bytes + len(block) > self.max_backlog:
+            self.num_dropped += len(block)
+            LOGGER.warning("Compression backlog full, dropped %s bytes", len(block))
+            return
+        self._queue.append((block, t_first, t_last))
+        self._queue_bytes += len(block)
+        self.changed.notify_all()
+
+    def run(self):
+        while True:
+            with self.changed:
+                while not self._queue and not self._closed:
+                    if self._block and self._block_due():
+                        self._seal()
+                        break
+                    self.changed.wait(self.flush_interval / 2.0)
+                if not self._queue:
+                    if self._closed:
+                        break
+                    continue
+                block, t_first, t_last = self._queue.popleft()
+                self._queue_bytes -= len(block)
+                backlog = len(self._queue)
+
+            self._adapt_level(backlog)
+            self._write_block(block, t_first, t_last)
+
+        self._close_file()
+
+    def _adapt_level(self, backlog):
+        levels = COMPRESSION_LEVELS[self.method]
+        idx = self._level_idx
+        if backlog >= BACKLOG_BLOCKS and idx < len(levels) - 1:
+            idx += 1
+        elif backlog == 0 and idx > 0:
+            idx -= 1
+        if idx != self._level_idx:
+            LOGGER.info(
+                "Compression backlog %s blocks, level %s -> %s",
+                backlog,
+                levels[self._level_idx],
+                levels[idx],
+            )
+            self._level_idx = idx
+            self.level_changes += 1
+
+    def _write_block(self, block, t_first, t_last):
+        if self._rotate_due():
+            self._open_next()
+        level = self.level
+        data = compress_block(self.method, level, block)
+        offset = self._fp.tell()
+        self._fp.write(data)
+        self._fp_idx.write(
+            INDEX_ENTRY.pack(
+                offset,
+                self._stream_offset,
+                len(data),
+                len(block),
+                t_first,
+                t_last,
+                level,
+            )
+        )
+        # whole blocks only, files stay readable while capturing
+        self._fp.flush()
+        self._fp_idx.flush()
+
+        self._stream_offset += len(block)
+        self.num_compressed += len(data)
+        self.num_blocks += 1
+
+    def _rotate_due(self):
+        if self._fp is None:
+            return True
+        if self.rotate_size and self._fp.tell() >= self.rotate_size:
+            return True
+        if (
+            self.rotate_interval
+            and time.monotonic() - self._t_file >= self.rotate_interval
+        ):
+            return True
+        return False
+
+    def _open_next(self):
+        self._close_file()
+
+        idx = len(self.files)
+        if "{}" in self.filename:
+            fn = self.filename.format(idx)
+        elif idx:
+            fn = "{}.{}".format(self.filename, idx)
+        else:
+            fn = self.filename
+
+        self._fp = open(fn, "wb")
+        self._fp_idx = open(fn + ".idx", "wb")
+        self._fp_idx.write(INDEX_MAGIC)
+        self._fp_idx.write(self.method.encode("ascii") + b"\n")
+        self._t_file = time.monotonic()
+        self.files.append(fn)
+        LOGGER.debug("Capture file: %s", fn)
+
+    def _close_file(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp_idx.close()
+            self._fp = self._fp_idx = None
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "bytes": self.num_bytes,
+                "compressed": self.num_compressed,
+                "ratio": self.num_compressed
+                / max(1, self.num_bytes - self.num_dropped),
+                "blocks": self.num_blocks,
+                "dropped": self.num_dropped,
+                "backlog": self._queue_bytes,
+                "level": self.level,
+                "level_changes": self.level_changes,
+                "files": list(self.files),
+            }
+
+    def close(self, timeout=None):
+        """Seal the last block, wait for compression to finish."""
+        with self.changed:
+            if self._block:
+                self._seal()
+            self._closed = True
+            self.changed.notify_all()
+        self.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+# ----------------------------------------------------------------------------
+
+
+def read_index(filename):
+    """Return ``(method, entries)`` of a capture file index, entries are
+    tuples, see :data:`INDEX_ENTRY`."""
+    with open(filename + ".idx", "rb") as fp:
+        if fp.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError("Not a capture index!")
+        method = fp.readline().decode("ascii").strip()
+        data = fp.read()
+    num = len(data) // INDEX_ENTRY.size
+    return method, [
+        INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size) for i in range(num)
+    ]
+
+
+def read_region(filename, t_start=None, t_end=None):
+    """Decompress only the blocks of a capture file that overlap the
+    wall clock time range ``[t_start, t_end]`` (None is open)."""
+    method, entries = read_index(filename)
+    data = bytearray()
+    with open(filename, "rb") as fp:
+        for offset, _, size, _, t_first, t_last, _ in entries:
+            if t_start is not None and t_last < t_start:
+                continue
+            if t_end is not None and t_first > t_end:
+                break
+            fp.seek(offset)
+            data += decompress_block(method, fp.read(size))
+    return data
+
+
+# ----------------------------------------------------------------------------
+
+
+def main(fd, filename="capture-{}.gz", **kwargs):
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    ser = CP210xSerial(device, baudRate=115200)
+    with CompressedCaptureSink(filename, **kwargs) as sink:
+        ser.add_rx_sink(sink)
+        try:
+            ser.open(_async=True)
+            LOGGER.info("Capturing to %s, stop with Ctrl+C ...", filename)
+            while True:
+                time.sleep(1.0)
+                # consume, keep buffer small
+                ser._buf_in.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ser.close()
+            ser.remove_rx_sink(sink)
+    LOGGER.info("Capture stats: %s", sink.get_stats())
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compressed rolling RX capture.")
+    parser.add_argument("fd", type=int, help="USB fd (termux)")
+    parser.add_argument("filename", nargs="?", default="capture-{}.gz")
+    parser.add_argument("--method", choices=sorted(COMPRESSION_LEVELS), default="gzip")
+    parser.add_argument("--rotate-size", type=int, help="bytes (compressed)")
+    parser.add_argument("--rotate-interval", type=float, help="seconds")
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    main(
+        args.fd,
+        args.filename,
+        method=args.method,
+        rotate_size=args.rotate_size,
+        rotate_interval=args.rotate_interval,
+    )
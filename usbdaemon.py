@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from usblib import device_from_fd
+from usblib import Buffer
+from usblib import CP210xSerial
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: default socket path, relative to working directory
+DEFAULT_SOCKET_PATH = "usbdaemon.sock"
+
+#: client handshake, first line: "USBD1 <policy> <queue size>\n"
+HANDSHAKE_MAGIC = "USBD1"
+
+#: backpressure policies for slow clients
+POLICY_DROP = "drop"
+POLICY_BLOCK = "block"
+POLICY_DISCONNECT = "disconnect"
+POLICIES = (POLICY_DROP, POLICY_BLOCK, POLICY_DISCONNECT)
+
+DEFAULT_QUEUE_SIZE = 256 * 1024
+#: max time a "block" client may stall the RX thread per transfer (sec)
+BLOCK_TIMEOUT = 1.0
+#: accept() timeout, to notice a dead port (sec)
+ACCEPT_TIMEOUT = 0.5
+
+# ----------------------------------------------------------------------------
+
+
+class ClientConnection:
+    """One attached client: RX sink with own queue and backpressure
+    policy, a sender thread (RX -> socket) and a receiver thread
+    (socket -> TX, multiplexed with other clients)."""
+
+    def __init__(self, daemon, sock, policy, queue_size):
+        if queue_size <= 0:
+            raise ValueError("queue size must be positive: {}".format(queue_size))
+        self.daemon = daemon
+        self.sock = sock
+        self.policy = policy
+        self.queue = Buffer(maxsize=queue_size)
+        self.closed = False
+
+        self.num_sent = 0
+        self.num_dropped = 0
+        self.num_tx = 0
+
+        self._thrd_send = threading.Thread(target=self._run_send, daemon=True)
+        self._thrd_recv = threading.Thread(target=self._run_recv, daemon=True)
+
+    def start(self):
+        self._thrd_send.start()
+        self._thrd_recv.start()
+
+    # called by RX thread
+    def write(self, data, timestamp):
+        if self.closed:
+            return
+        queue = self.queue
+        with queue.changed:
+            if queue.space() < len(data):
+                if self.policy == POLICY_BLOCK:
+                    queue.changed.wait_for(
+                        lambda: self.closed or queue.space() >= len(data),
+                        BLOCK_TIMEOUT,
+                    )
+                elif self.policy == POLICY_DISCONNECT:
+                    LOGGER.info("Client too slow, disconnect: %s", self)
+                    self.close()
+                    return
+            if queue.space() < len(data):
+                self.num_dropped += len(data)
+                return
+            queue.write(data, timestamp)
+
+    def _run_send(self):
+        queue = self.queue
+        try:
+            while not self.closed:
+                with queue.changed:
+                    while not queue and not self.closed:
+                        queue.changed.wait(0.5)
+                    data = queue.read(64 * 1024)
+                if data:
+                    self.sock.sendall(data)
+                    self.num_sent += len(data)
+        except OSError as ex:
+            LOGGER.debug("Client send error: %s", ex)
+        finally:
+            self.close()
+
+    def _run_recv(self):
+        ser = self.daemon.serial
+        try:
+            while not self.closed:
+                data = self.sock.recv(4096)
+                if not data:
+                    break
+                self.num_tx += ser.write(data)
+        except OSError as ex:
+            LOGGER.debug("Client recv error: %s", ex)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        with self.queue.changed:
+            self.queue.changed.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.daemon._detach(self)
+        LOGGER.info(
+            "Client detached, sent %s, dropped %s, tx %s bytes",
+            self.num_sent,
+            self.num_dropped,
+            self.num_tx,
+        )
+
+
+class PortDaemon:
+    """Keep one :class:`CP210xSerial` open and serve its RX stream to
+    many local clients over a Unix domain socket, TX from clients is
+    multiplexed onto the port.
+
+    Clients start with a handshake line ``USBD1 <policy> <queue size>``,
+    policy is one of :data:`POLICIES`, see :class:`DaemonClient`."""
+
+    def __init__(self, serial, path=DEFAULT_SOCKET_PATH):
+        self.serial = serial
+        self.path = path
+        self.clients = list()
+        self.lock = threading.Lock()
+        self._sock = None
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(8)
+        # wake up regularly, stop serving once the port died (last_error)
+        self._sock.settimeout(ACCEPT_TIMEOUT)
+        LOGGER.info("Serving port on %s", self.path)
+
+        try:
+            while self.serial.is_open:
+                try:
+                    sock, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                try:
+                    self._attach(sock)
+                except (OSError, ValueError) as ex:
+                    LOGGER.warning("Client handshake failed: %s", ex)
+                    sock.close()
+        finally:
+            if self.serial.last_error is not None:
+                LOGGER.error("Port closed: %s", self.serial.last_error)
+            self.shutdown()
+
+    def _attach(self, sock):
+        # handshake line
+        sock.settimeout(2.0)
+        line = bytearray()
+        while not line.endswith(b"\n"):
+            chunk = sock.recv(1)
+            if not chunk or len(line) > 128:
+                raise ValueError("incomplete handshake")
+            line += chunk
+        sock.settimeout(None)
+
+        magic, policy, queue_size = line.decode("ascii").split()
+        if magic != HANDSHAKE_MAGIC or policy not in POLICIES:
+            raise ValueError("bad handshake: {!r}".format(bytes(line)))
+
+        client = ClientConnection(self, sock, policy, int(queue_size))
+        with self.lock:
+            self.clients.append(client)
+        self.serial.add_rx_sink(client)
+        client.start()
+        LOGGER.info("Client attached, policy %s, queue %s", policy, queue_size)
+
+    def _detach(self, client):
+        self.serial.remove_rx_sink(client)
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def shutdown(self):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.close()
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+# ----------------------------------------------------------------------------
+
+
+class DaemonClient:
+    """Client for :class:`PortDaemon` with the read API of
+    :class:`CP210xSerial` (``read``, ``read_until``, ...) and
+    ``write``, so e.g. :func:`dso138mini.grab_data` works unchanged."""
+
+    read = CP210xSerial.read
+    read_with_timestamps = CP210xSerial.read_with_timestamps
+    read_until = CP210xSerial.read_until
+    read_until_or_none = CP210xSerial.read_until_or_none
+    wait_on_read_buffer = CP210xSerial.wait_on_read_buffer
+    _wait_rx = CP210xSerial._wait_rx
+
+    def __init__(
+        self,
+        path=DEFAULT_SOCKET_PATH,
+        policy=POLICY_DROP,
+        queue_size=DEFAULT_QUEUE_SIZE,
+    ):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._sock.sendall(
+            "{} {} {}\n".format(HANDSHAKE_MAGIC, policy, queue_size).encode("ascii")
+        )
+        self._buf_in = Buffer(timestamps=True)
+        self._is_open = True
+        self._thrd = threading.Thread(target=self._run, daemon=True)
+        self._thrd.start()
+
+    @property
+    def is_open(self):
+        return self._is_open
+
+    def _run(self):
+        try:
+            while True:
+                data = self._sock.recv(64 * 1024)
+                if not data:
+                    break
+                self._buf_in.write(data, time.monotonic())
+        except OSError:
+            pass
+        finally:
+            self._is_open = False
+            with self._buf_in.changed:
+                self._buf_in.changed.notify_all()
+
+    def write(self, data):
+        self._sock.sendall(data)
+        return len(data)
+
+    def close(self):
+        self._is_open = False
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+# ----------------------------------------------------------------------------
+
+
+def main(fd, path=DEFAULT_SOCKET_PATH, baudRate=115200):
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    # RX data goes to clients (sinks) only, nobody reads locally
+    ser = CP210xSerial(device, baudRate=baudRate, buffer_rx=False)
+    daemon = PortDaemon(ser, path)
+    try:
+        ser.open(_async=True)
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+        ser.close()
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.DEBUG)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    # grab fd number from args
+    #   (from termux wrapper)
+    import sys
+
+    LOGGER.debug("args: %s", sys.argv)
+
+    fd = int(sys.argv[1])
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SOCKET_PATH
+    main(fd, path)
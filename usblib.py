@@ -1,7 +1,13 @@
 #!/usr/bin/env python
 
+import array
+import bisect
+import collections
+import concurrent.futures
+import errno
 import logging
 import struct
+import sys
 import threading
 import time
 
@@ -92,6 +98,118 @@ FLOW_CONTROL_XON_XOFF = 3
 #: in msec
 DEFAUL_TIMEOUT = 500
 
+#: RX poll timeout in msec, bounds shutdown (no cancellable sync transfers)
+RX_POLL_TIMEOUT = 50
+#: max time for close() to stop threads, in sec
+CLOSE_TIMEOUT = 0.5
+#: control transfer timeout on close, in msec
+CLOSE_CTRL_TIMEOUT = 100
+
+#: shared RX store for subscribers, bytes
+DEFAULT_RX_STORE_SIZE = 1024 * 1024
+#: max time a "block" subscriber may stall the RX thread (sec)
+SUBSCRIBER_BLOCK_TIMEOUT = 1.0
+
+#: lagging subscriber policies, block producer or drop data (gap)
+SUBSCRIBER_BLOCK = "block"
+SUBSCRIBER_DROP = "drop"
+
+#: max pipelined commands in flight, see CP210xSerial.transact()
+DEFAULT_MAX_IN_FLIGHT = 8
+#: default response terminator (AT-like protocols)
+DEFAULT_TERMINATOR = b"\r\n"
+#: time a timed out command's late response is still expected (sec),
+#:   it is discarded instead of being matched to the next command
+TRANSACT_STALE_TIMEOUT = 1.0
+
+#: sample dtype (numpy style, "<i2", "f4", ...) -> array.array typecode,
+#: fallback for read_samples() without numpy
+SAMPLE_TYPECODES = {
+    "i1": "b",
+    "u1": "B",
+    "i2": "h",
+    "u2": "H",
+    "i4": "i" if array.array("i").itemsize == 4 else "l",
+    "u4": "I" if array.array("I").itemsize == 4 else "L",
+    "i8": "q",
+    "u8": "Q",
+    "f4": "f",
+    "f8": "d",
+}
+
+#: USB error classes, see classify_usb_error()
+USB_ERROR_TIMEOUT = "timeout"
+USB_ERROR_PIPE = "pipe"
+USB_ERROR_OVERFLOW = "overflow"
+USB_ERROR_DISCONNECT = "disconnect"
+USB_ERROR_TRANSIENT = "transient"
+
+#: consecutive errors (not timeouts) before a thread gives up (fatal)
+MAX_CONSECUTIVE_ERRORS = 20
+#: pause before retrying after a transient error or restart (sec)
+RECOVERY_BACKOFF = 0.01
+
+#: TX pacer burst allowance, bytes (e.g. 16 byte UART FIFO of target)
+DEFAULT_TX_BURST = 16
+
+#: TX priority lanes, lower value is sent first, see CP210xSerial.write()
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+TX_PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL)
+#: queue delay samples kept per TX lane for percentiles
+TX_LANE_LATENCY_SAMPLES = 1024
+
+#: modem status bits (GET_MDMSTS)
+MODEM_CTS = 0x10
+MODEM_DSR = 0x20
+MODEM_RI = 0x40
+MODEM_DCD = 0x80
+MODEM_LINES = (
+    ("cts", MODEM_CTS),
+    ("dsr", MODEM_DSR),
+    ("ri", MODEM_RI),
+    ("dcd", MODEM_DCD),
+)
+#: line error bits (GET_COMM_STATUS, ulErrors)
+LINE_ERRORS = (
+    ("break", 0x01),
+    ("framing", 0x02),
+    ("hw_overrun", 0x04),
+    ("queue_overrun", 0x08),
+    ("parity", 0x10),
+)
+
+#: serial events, see CP210xSerial.add_event_handler()
+EVENT_DATA = "data"
+EVENT_DELIMITER = "delimiter"
+EVENT_MODEM = "modem"
+EVENT_LINE_ERROR = "line_error"
+EVENT_KINDS = (EVENT_DATA, EVENT_DELIMITER, EVENT_MODEM, EVENT_LINE_ERROR)
+#: max events waiting for dispatch, bursts are coalesced
+DEFAULT_EVENT_QUEUE_SIZE = 256
+#: max data bytes coalesced into one data event
+DEFAULT_EVENT_MAX_DATA = 64 * 1024
+#: queue delay samples kept for percentiles
+EVENT_DELAY_SAMPLES = 1024
+
+#: default TX buffer limit, bytes
+DEFAULT_TX_BUFFER_SIZE = 64 * 1024
+
+#: CP2102 receive FIFO, bytes
+CP210x_RX_FIFO_SIZE = 576
+#: max bulk IN transfer size for profiles
+MAX_TRANSFER_SIZE = 16 * 1024
+
+#: RX thread transfer profiles,
+#:   name: (data time per transfer in sec, read timeout in msec,
+#:          idle back-off after short transfer as fraction of FIFO fill time)
+#:   read timeouts are kept short as they bound close()
+PORT_PROFILES = {
+    "low_latency": (0.0, RX_POLL_TIMEOUT, 0.0),
+    "throughput": (0.01, 100, 0.25),
+    "power_save": (0.05, 250, 0.5),
+}
+
 # ----------------------------------------------------------------------------
 
 
@@ -183,28 +301,91 @@ def shell_usbdevice(fd, device):
 
 class Buffer:
     # https://stackoverflow.com/a/57748513/9360161
-    def __init__(self):
+    def __init__(self, timestamps=False, maxsize=None, shared=None):
         self.buf = bytearray()
-        self.lock = threading.RLock()
-        self.changed = threading.Condition(self.lock)
-        # TODO: max size? - dequeue? / ringbuffer
+        if shared is not None:
+            # same lock and condition as other buffer, one wait for both
+            self.lock = shared.lock
+            self.changed = shared.changed
+        else:
+            self.lock = threading.RLock()
+            self.changed = threading.Condition(self.lock)
+        # TODO: dequeue? / ringbuffer
+        #: soft limit, checked by producers with space(), write() ignores it
+        self.maxsize = maxsize
+
+        # arrival time index, one entry per write (transfer), not per byte
+        #   offsets are absolute stream positions (total bytes written), so
+        #   reads only need to drop consumed entries from the front
+        self.timestamps = timestamps
+        self._offset = 0
+        self._ts_offsets = array.array("Q")
+        self._ts_times = array.array("d")
 
     def clear(self):
         with self.lock:
+            self._offset += len(self.buf)
             self.buf[:] = b""
-            self.changed.notify()
+            del self._ts_offsets[:]
+            del self._ts_times[:]
+            self.changed.notify_all()
 
-    def write(self, data):
+    def write(self, data, timestamp=None):
+        """Append data to buffer.
+
+        If the buffer tracks timestamps then the arrival time of this
+        chunk is recorded, either the given ``timestamp`` (from
+        ``time.monotonic()``) or the current time."""
         with self.lock:
             try:
                 if isinstance(data, int):
+                    self._stamp(1, timestamp)
                     self.buf.append(data)
                     return 1
                 else:
+                    self._stamp(len(data), timestamp)
                     self.buf.extend(data)
                     return len(data)
             finally:
-                self.changed.notify()
+                self.changed.notify_all()
+
+    def writev(self, fragments, timestamp=None):
+        """Append a sequence of bytes-like fragments, single notify."""
+        with self.lock:
+            try:
+                total = 0
+                for data in fragments:
+                    self._stamp(len(data), timestamp)
+                    self.buf.extend(data)
+                    total += len(data)
+                return total
+            finally:
+                self.changed.notify_all()
+
+    def _stamp(self, size, timestamp):
+        if not self.timestamps or not size:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._ts_offsets.append(self._offset + len(self.buf))
+        self._ts_times.append(timestamp)
+
+    def _time_at(self, pos):
+        # arrival time of byte at relative position pos in buffer
+        idx = bisect.bisect_right(self._ts_offsets, self._offset + pos) - 1
+        if idx < 0:
+            return None
+        return self._ts_times[idx]
+
+    def _consumed(self, size):
+        self._offset += size
+        if not self._ts_offsets:
+            return
+        # keep entry that covers the new first byte
+        idx = bisect.bisect_right(self._ts_offsets, self._offset) - 1
+        if idx > 0:
+            del self._ts_offsets[:idx]
+            del self._ts_times[:idx]
 
     def read(self, size):
         with self.lock:
@@ -218,30 +399,66 @@ class Buffer:
 
                 data = self.buf[:size]
                 self.buf[:size] = b""
+                self._consumed(len(data))
                 return data
             finally:
-                self.changed.notify()
+                self.changed.notify_all()
 
-    def read_until(self, expected, size=-1):
+    def readinto(self, b):
+        """Read into writable buffer b (single copy), return count."""
+        with self.lock:
+            try:
+                target = memoryview(b).cast("B")
+                size = min(target.nbytes, len(self.buf))
+                with memoryview(self.buf) as view:
+                    target[:size] = view[:size]
+                del self.buf[:size]
+                self._consumed(size)
+                return size
+            finally:
+                self.changed.notify_all()
+
+    def read_with_timestamps(self, size):
+        """Read like :meth:`read` but return a tuple of
+        ``(data, time_first, time_last)`` with the arrival times of the
+        first and last byte (``None`` if no data or not tracked)."""
+        with self.lock:
+            if not size or size <= 0:
+                size = len(self)
+            size = min(size, len(self))
+            if not size:
+                return self.read(size), None, None
+            t_first, t_last = self._time_at(0), self._time_at(size - 1)
+            return self.read(size), t_first, t_last
+
+    def _find_until(self, expected, size=-1):
+        # length of data to read for read_until
         try:
             elen = len(expected)
         except TypeError:
             elen = 1
 
-        with self.lock:
-            pos = self.buf.find(expected)
+        pos = self.buf.find(expected)
 
-            # not found, return max
-            if pos == -1:
-                return self.read(size)
+        # not found, return max
+        if pos == -1:
+            return size
 
-            # found, compute total length
-            elen = pos + elen
-            # if len restriction then until limit
-            if size > 0 and elen > size:
-                return self.read(size)
-            # return normal
-            return self.read(elen)
+        # found, compute total length
+        elen = pos + elen
+        # if len restriction then until limit
+        if size > 0 and elen > size:
+            return size
+        # return normal
+        return elen
+
+    def read_until(self, expected, size=-1):
+        with self.lock:
+            return self.read(self._find_until(expected, size))
+
+    def read_until_with_timestamps(self, expected, size=-1):
+        with self.lock:
+            return self.read_with_timestamps(self._find_until(expected, size))
 
     def contains(self, expected):
         with self.lock:
@@ -250,6 +467,12 @@ class Buffer:
     def peek(self, size):
         return self.buf[:size]
 
+    def space(self):
+        """Free space in bytes, None if unbounded."""
+        if not self.maxsize:
+            return None
+        return max(0, self.maxsize - len(self.buf))
+
     def __len__(self):
         return len(self.buf)
 
@@ -312,8 +535,394 @@ class Timeout:
         pass
 
 
+class SharedBuffer:
+    """Non-destructive byte store for multiple subscribers.
+
+    Each :class:`BufferSubscriber` has its own read cursor (absolute
+    stream offset). Storage is reclaimed once the slowest subscriber
+    passed it. If the store is full (maxsize) the producer waits for
+    ``block`` subscribers (at most block_timeout), ``drop`` subscribers
+    (and timed out ones) skip the data, recorded as gap.
+    """
+
+    def __init__(self, maxsize=DEFAULT_RX_STORE_SIZE, block_timeout=None):
+        if block_timeout is None:
+            block_timeout = SUBSCRIBER_BLOCK_TIMEOUT
+        self.buf = bytearray()
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.maxsize = maxsize
+        self.block_timeout = block_timeout
+        #: absolute stream offset of buf[0]
+        self.base = 0
+        self.subscribers = list()
+        #: end of stream (port closed), subscribers stop waiting
+        self.closed = False
+
+    @property
+    def end(self):
+        return self.base + len(self.buf)
+
+    def subscribe(self, policy=SUBSCRIBER_BLOCK):
+        """New subscriber, starts at the current end of the stream."""
+        if policy not in (SUBSCRIBER_BLOCK, SUBSCRIBER_DROP):
+            raise ValueError("Unknown subscriber policy: {}".format(policy))
+        with self.lock:
+            sub = BufferSubscriber(self, policy)
+            self.subscribers.append(sub)
+            return sub
+
+    def unsubscribe(self, sub):
+        with self.changed:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+            self._reclaim()
+            self.changed.notify_all()
+
+    def write(self, data, timestamp=None):
+        with self.changed:
+            if self.maxsize and len(self.buf) + len(data) > self.maxsize:
+                self._make_room(self.end + len(data) - self.maxsize)
+            self.buf.extend(data)
+            self.changed.notify_all()
+            return len(data)
+
+    def close(self):
+        """Mark end of stream, wake up waiting subscribers."""
+        with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+
+    def _make_room(self, new_base):
+        def blocked():
+            return any(
+                sub.policy == SUBSCRIBER_BLOCK and sub.cursor < new_base
+                for sub in self.subscribers
+            )
+
+        if blocked():
+            self.changed.wait_for(lambda: not blocked(), self.block_timeout)
+
+        for sub in self.subscribers:
+            if sub.cursor < new_base:
+                sub._skip_to(new_base)
+        self._reclaim()
+
+    def _reclaim(self):
+        # drop data all subscribers have passed
+        if self.subscribers:
+            new_base = min(sub.cursor for sub in self.subscribers)
+        else:
+            new_base = self.end
+        if new_base > self.base:
+            del self.buf[: new_base - self.base]
+            self.base = new_base
+
+
+class BufferSubscriber:
+    """Subscriber of a :class:`SharedBuffer` with own read cursor, the
+    read API follows :class:`CP210xSerial`. Skipped (dropped) data is
+    recorded in ``gaps`` as ``(stream offset, size)``."""
+
+    def __init__(self, store, policy):
+        self.store = store
+        self.policy = policy
+        self.cursor = store.end
+        self.gaps = list()
+        self.lost = 0
+
+    def _skip_to(self, offset):
+        if self.gaps and sum(self.gaps[-1]) == self.cursor:
+            # extend previous gap
+            start, _ = self.gaps.pop()
+        else:
+            start = self.cursor
+        self.gaps.append((start, offset - start))
+        self.lost += offset - self.cursor
+        self.cursor = offset
+
+    def take_gaps(self):
+        """Return and clear list of gaps since last call."""
+        with self.store.lock:
+            gaps, self.gaps = self.gaps, list()
+            return gaps
+
+    def __len__(self):
+        return self.store.end - self.cursor
+
+    def _consume(self, size):
+        store = self.store
+        start = self.cursor - store.base
+        data = store.buf[start : start + size]
+        self.cursor += len(data)
+        store._reclaim()
+        # wake up blocked producer
+        store.changed.notify_all()
+        return data
+
+    def read(self, size=-1, timeout=None):
+        """Read size bytes, see :meth:`CP210xSerial.read`."""
+        store = self.store
+        with store.changed, Timeout(timeout) as to:
+            if size and size > 0:
+                while len(self) < size and not to.expired() and not store.closed:
+                    store.changed.wait(to.time_left() or DEFAUL_TIMEOUT / 1000.0)
+            else:
+                size = len(self)
+            return self._consume(min(size, len(self)))
+
+    def read_until(self, expected=b"\n", size=None, timeout=None):
+        """Read until expected, see :meth:`CP210xSerial.read_until`."""
+        if not size or size <= 0:
+            size = -1
+        try:
+            elen = len(expected)
+        except TypeError:
+            elen = 1
+
+        store = self.store
+        with store.changed, Timeout(timeout) as to:
+            while True:
+                start = self.cursor - store.base
+                pos = store.buf.find(expected, start)
+                if pos != -1:
+                    rlen = pos - start + elen
+                    break
+                rlen = len(self)
+                if (size > 0 and rlen >= size) or to.expired() or store.closed:
+                    break
+                store.changed.wait(to.time_left() or DEFAUL_TIMEOUT / 1000.0)
+            if size > 0:
+                rlen = min(rlen, size)
+            return self._consume(rlen)
+
+    def close(self):
+        self.store.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+#: numpy module, None if not installed, False until first use
+_numpy = False
+
+
+def _get_numpy():
+    # numpy module or None, imported on first use (slow import)
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def sample_typecode(dtype):
+    """Map numpy style dtype string (``"<i2"``, ``"f4"``, ``"int16"``)
+    to ``(array typecode, byteswap needed)``, see :data:`SAMPLE_TYPECODES`."""
+    order = "<"
+    if dtype[:1] in "<>=":
+        order, dtype = dtype[0], dtype[1:]
+    for name, kind in (("uint", "u"), ("int", "i"), ("float", "f")):
+        if dtype.startswith(name):
+            dtype = "{}{}".format(kind, int(dtype[len(name) :]) // 8)
+            break
+    swap = order != "=" and (order == "<") != (sys.byteorder == "little")
+    return SAMPLE_TYPECODES[dtype], swap
+
+
+def as_byte_view(data):
+    """Flat byte memoryview of bytes-like data (no copy), ints and int
+    sequences are converted."""
+    if isinstance(data, int):
+        data = bytes((data,))
+    try:
+        return memoryview(data).cast("B")
+    except TypeError:
+        # list of ints etc.
+        return memoryview(bytes(data))
+
+
+class StatusCache:
+    """Cached result of a (control transfer) query with TTL.
+
+    Concurrent callers are coalesced: if a fetch is in flight, others
+    wait for its result instead of issuing another transfer. Errors of
+    the fetch are raised in all waiting callers.
+    """
+
+    def __init__(self, fetch, ttl=0.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self._value = None
+        self._error = None
+        self._time = None
+        self._in_flight = False
+        self._generation = 0
+
+    def invalidate(self):
+        with self.lock:
+            self._time = None
+
+    def get(self, max_age=None):
+        """Return cached value if not older than max_age seconds
+        (default: TTL), else fetch (or wait for the fetch in flight)."""
+        if max_age is None:
+            max_age = self.ttl
+
+        with self.lock:
+            if self._time is not None and time.monotonic() - self._time <= max_age:
+                return self._value
+
+            if self._in_flight:
+                # coalesce, wait for running fetch
+                generation = self._generation
+                while self._in_flight and generation == self._generation:
+                    self.changed.wait()
+                if self._error is not None:
+                    raise self._error
+                return self._value
+
+            self._in_flight = True
+
+        value = error = None
+        try:
+            value = self.fetch()
+        except Exception as ex:
+            error = ex
+
+        with self.lock:
+            self._value, self._error = value, error
+            self._time = time.monotonic() if error is None else None
+            self._in_flight = False
+            self._generation += 1
+            self.changed.notify_all()
+
+        if error is not None:
+            raise error
+        return value
+
+
+class DumpWriter:
+    """Large buffered binary writer with time based flush and optional
+    size based file rotation.
+
+    output is a filename or a binary file object (default
+    ``sys.stdout.buffer``). For rotation a filename is required, it may
+    contain a ``{}`` placeholder for the file index, else the index is
+    appended as suffix (``dump.bin``, ``dump.bin.1``, ...).
+    """
+
+    def __init__(
+        self, output=None, buffer_size=1024 * 1024, flush_interval=0.5, rotate_size=None
+    ):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.rotate_size = rotate_size
+
+        self._filename = None
+        self._fp = None
+        self._own_fp = False
+        if output is None:
+            output = sys.stdout.buffer
+        if isinstance(output, str):
+            self._filename = output
+        else:
+            assert not rotate_size, "Rotation requires a filename!"
+            self._fp = output
+
+        self.files = list()
+        self.num_bytes = 0
+        self._file_bytes = 0
+        self._last_flush = time.monotonic()
+
+        if self._fp is None:
+            self._open_next()
+
+    def _open_next(self):
+        if self._fp is not None:
+            self._fp.close()
+
+        idx = len(self.files)
+        if "{}" in self._filename:
+            fn = self._filename.format(idx)
+        elif idx:
+            fn = "{}.{}".format(self._filename, idx)
+        else:
+            fn = self._filename
+
+        self._fp = open(fn, "wb", buffering=self.buffer_size)
+        self._own_fp = True
+        self._file_bytes = 0
+        self.files.append(fn)
+
+    def write(self, data):
+        if self.rotate_size and self._file_bytes + len(data) > self.rotate_size:
+            self._open_next()
+
+        self._fp.write(data)
+        self._file_bytes += len(data)
+        self.num_bytes += len(data)
+
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._fp.flush()
+            self._last_flush = now
+
+    def close(self):
+        if self._fp is None:
+            return
+        if self._own_fp:
+            self._fp.close()
+        else:
+            self._fp.flush()
+        self._fp = None
+
+
+def compute_transfer_profile(name, baudRate, packet_size=64, bits_per_char=10):
+    """Compute RX transfer parameters of a named profile for a baud rate.
+
+    Returns a dict with ``read_size`` (bytes, multiple of packet_size),
+    ``read_timeout`` (msec) and ``idle_backoff`` (sec, sleep after a
+    short transfer to let data accumulate, always below the time the
+    device FIFO needs to fill up).
+    """
+    if name not in PORT_PROFILES:
+        raise ValueError("Unknown port profile: {}".format(name))
+    transfer_time, read_timeout, backoff_fraction = PORT_PROFILES[name]
+
+    bytes_per_sec = baudRate / float(bits_per_char)
+
+    read_size = int(bytes_per_sec * transfer_time)
+    # round up to full packets
+    read_size = -(-read_size // packet_size) * packet_size
+    read_size = min(max(read_size, packet_size), MAX_TRANSFER_SIZE)
+
+    fifo_time = CP210x_RX_FIFO_SIZE / bytes_per_sec
+    idle_backoff = fifo_time * backoff_fraction
+
+    return {
+        "name": name,
+        "read_size": read_size,
+        "read_timeout": read_timeout,
+        "idle_backoff": idle_backoff,
+    }
+
+
 class AbstractStoppableThread(threading.Thread):
     def __init__(self, serial, *args, **kwargs):
+        # never block interpreter exit on a hanging transfer
+        kwargs.setdefault("daemon", True)
         super(AbstractStoppableThread, self).__init__(*args, **kwargs)
         self.serial = serial
         self.should_stop = False
@@ -338,48 +947,543 @@ class AbstractStoppableThread(threading.Thread):
         raise NotImplementedError
 
 
+class TxPacer:
+    """Token bucket metering TX bytes to a rate (bytes/sec), bursts up
+    to burst bytes go out immediately. Used by the TX thread (which
+    limits transfers to burst bytes), see
+    :meth:`CP210xSerial.set_tx_pacing`."""
+
+    def __init__(self, rate, burst=DEFAULT_TX_BURST):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = burst
+        self._t_last = time.monotonic()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.num_bytes = 0
+        self.num_waits = 0
+        self.wait_time = 0.0
+        # transfers sent back to back (line busy), for achieved rate
+        self._busy_bytes = 0
+        self._busy_time = 0.0
+        self._t_done = None
+        self._t_request = None
+
+    def wait(self, size):
+        """Block until size bytes may be sent."""
+        now = time.monotonic()
+        self._t_request = now
+        self._tokens = min(self.burst, self._tokens + (now - self._t_last) * self.rate)
+        self._t_last = now
+        self._tokens -= size
+        if self._tokens < 0:
+            delay = -self._tokens / self.rate
+            self.num_waits += 1
+            self.wait_time += delay
+            time.sleep(delay)
+
+    def completed(self, size, t_done):
+        """Record a finished transfer (bytes written, completion time).
+        The achieved rate is measured over transfers requested right
+        after the previous one completed (no idle TX queue)."""
+        if (
+            self._t_done is not None
+            and self._t_request - self._t_done <= size / self.rate
+        ):
+            self._busy_bytes += size
+            self._busy_time += t_done - self._t_done
+        self._t_done = t_done
+        self.num_bytes += size
+
+    def get_stats(self):
+        busy_time = self._busy_time
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "bytes": self.num_bytes,
+            "waits": self.num_waits,
+            "wait_time": self.wait_time,
+            "achieved": self._busy_bytes / busy_time if busy_time else None,
+        }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values, None if empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+class TxLane:
+    """One TX priority lane: buffer, writer lock (keeps writes of one
+    call contiguous) and queue delay statistics."""
+
+    def __init__(self, priority, buffer):
+        self.priority = priority
+        self.buffer = buffer
+        self.lock = threading.RLock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.num_bytes = 0
+        self.num_transfers = 0
+        self.max_delay = 0.0
+        self._delays = collections.deque(maxlen=TX_LANE_LATENCY_SAMPLES)
+
+    # called by TX thread
+    def record(self, size, delay):
+        self.num_bytes += size
+        self.num_transfers += 1
+        if delay is not None:
+            self._delays.append(delay)
+            self.max_delay = max(self.max_delay, delay)
+
+    def get_stats(self):
+        delays = list(self._delays)
+        return {
+            "priority": self.priority,
+            "depth": len(self.buffer),
+            "bytes": self.num_bytes,
+            "transfers": self.num_transfers,
+            "delay_p50": percentile(delays, 50),
+            "delay_p99": percentile(delays, 99),
+            "delay_max": self.max_delay,
+        }
+
+
+class SerialEvent:
+    """Event passed to handlers, see :class:`EventDispatcher`.
+
+    kind is one of :data:`EVENT_KINDS`, timestamp the arrival time
+    (``time.monotonic()``) of the first occurrence, count the number of
+    coalesced occurrences. data holds the received bytes (``data``) or
+    the delimiter (``delimiter``), state a dict of line states
+    (``modem``, latest) or error flags (``line_error``, accumulated).
+    delay is the queue delay (emitted to dispatched, seconds)."""
+
+    def __init__(self, kind, key, timestamp, data=None, state=None, count=1):
+        self.kind = kind
+        self.key = key
+        self.timestamp = timestamp
+        self.data = bytearray(data) if kind == EVENT_DATA else data
+        self.state = state
+        self.count = count
+        self.t_queued = time.monotonic()
+        self.delay = None
+
+    def merge(self, data=None, state=None, count=1):
+        self.count += count
+        if self.kind == EVENT_DATA:
+            self.data += data
+        elif self.kind == EVENT_MODEM:
+            self.state = state
+        elif self.kind == EVENT_LINE_ERROR:
+            self.state = {k: v or self.state.get(k, False) for k, v in state.items()}
+
+    def __repr__(self):
+        return "<SerialEvent {} count={} delay={}>".format(
+            self.kind, self.count, self.delay
+        )
+
+
+class EventDispatcher:
+    """Run serial event handlers off the USB threads.
+
+    Events are emitted by the RX thread (as RX sink: data, delimiter)
+    and the status thread (modem line changes, line errors), queued
+    without blocking and delivered in order by a single drain task on
+    executor (a :class:`concurrent.futures.Executor`, default: own
+    single worker thread) or, if loop is given, on that asyncio loop
+    (coroutine handlers are scheduled as tasks).
+
+    An event is coalesced into a queued, not yet dispatched event of
+    the same kind (data up to max_data bytes), so bursts do not pile
+    up. At most max_queue events wait, more are dropped (counted). A
+    slow handler only delays other events, never a USB read, see
+    :meth:`get_stats` for queue delays."""
+
+    def __init__(
+        self,
+        executor=None,
+        loop=None,
+        max_queue=DEFAULT_EVENT_QUEUE_SIZE,
+        max_data=DEFAULT_EVENT_MAX_DATA,
+    ):
+        self.executor = executor
+        self._own_executor = executor is None
+        self.loop = loop
+        self.max_queue = max_queue
+        self.max_data = max_data
+        #: kind: [(callback, delimiter)], copy on write
+        self.handlers = dict()
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        # key: queued event, for coalescing
+        self._queued = dict()
+        self._scheduled = False
+        # delimiter: end of previous chunk, for matches across transfers
+        self._tails = dict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.num_events = 0
+        self.num_dispatched = 0
+        self.num_coalesced = 0
+        self.num_dropped = 0
+        self.num_errors = 0
+        self.max_delay = 0.0
+        self._delays = collections.deque(maxlen=EVENT_DELAY_SAMPLES)
+
+    def add_handler(self, kind, callback, delimiter=None):
+        if kind not in EVENT_KINDS:
+            raise ValueError("Unknown event: {}".format(kind))
+        if (kind == EVENT_DELIMITER) != (delimiter is not None):
+            raise ValueError("delimiter is required for (only) delimiter events")
+        if delimiter is not None:
+            delimiter = bytes(delimiter)
+        self.handlers[kind] = self.handlers.get(kind, []) + [(callback, delimiter)]
+
+    def remove_handler(self, kind, callback):
+        handlers = [h for h in self.handlers.get(kind, []) if h[0] is not callback]
+        self.handlers[kind] = handlers
+
+    def wants(self, *kinds):
+        return any(self.handlers.get(kind) for kind in kinds)
+
+    # called by RX thread, after data was added to the RX buffer
+    def write(self, data, timestamp=None):
+        if self.handlers.get(EVENT_DATA):
+            self.emit(EVENT_DATA, timestamp, data=data)
+        delimiters = {h[1] for h in self.handlers.get(EVENT_DELIMITER, ())}
+        for delimiter in delimiters:
+            chunk = self._tails.get(delimiter, b"") + bytes(data)
+            num = chunk.count(delimiter)
+            self._tails[delimiter] = chunk[len(chunk) - len(delimiter) + 1 :]
+            if num:
+                self.emit(
+                    EVENT_DELIMITER,
+                    timestamp,
+                    data=delimiter,
+                    count=num,
+                    key=(EVENT_DELIMITER, delimiter),
+                )
+
+    def emit(self, kind, timestamp=None, data=None, state=None, count=1, key=None):
+        """Queue an event, never blocks."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if key is None:
+            key = kind
+        with self._lock:
+            self.num_events += 1
+            event = self._queued.get(key)
+            if event is not None and (
+                kind != EVENT_DATA or len(event.data) + len(data) <= self.max_data
+            ):
+                event.merge(data, state, count)
+                self.num_coalesced += 1
+                return
+            if len(self._queue) >= self.max_queue:
+                self.num_dropped += 1
+                return
+            event = SerialEvent(kind, key, timestamp, data, state, count)
+            self._queue.append(event)
+            self._queued[key] = event
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._schedule()
+
+    def _schedule(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._drain)
+            return
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="CP210x-events"
+            )
+        self.executor.submit(self._drain)
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._scheduled = False
+                    return
+                event = self._queue.popleft()
+                if self._queued.get(event.key) is event:
+                    del self._queued[event.key]
+            event.delay = time.monotonic() - event.t_queued
+            self._delays.append(event.delay)
+            self.max_delay = max(self.max_delay, event.delay)
+            self.num_dispatched += 1
+
+            for callback, delimiter in self.handlers.get(event.kind, ()):
+                if delimiter is not None and delimiter != event.data:
+                    continue
+                try:
+                    result = callback(event)
+                    if self.loop is not None and result is not None:
+                        # with a loop asyncio is loaded already
+                        import asyncio
+
+                        if asyncio.iscoroutine(result):
+                            asyncio.ensure_future(result, loop=self.loop)
+                except Exception:
+                    self.num_errors += 1
+                    LOGGER.exception("Event handler %s failed!", callback)
+
+    def get_stats(self):
+        delays = list(self._delays)
+        return {
+            "events": self.num_events,
+            "dispatched": self.num_dispatched,
+            "coalesced": self.num_coalesced,
+            "dropped": self.num_dropped,
+            "errors": self.num_errors,
+            "queued": len(self._queue),
+            "delay_p50": percentile(delays, 50),
+            "delay_p99": percentile(delays, 99),
+            "delay_max": self.max_delay,
+        }
+
+    def close(self):
+        """Shut down own executor (recreated on next event)."""
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+def classify_usb_error(ue):
+    """Classify a libusb :class:`USBError`, one of the ``USB_ERROR_*``
+    constants. Unknown errors are transient (retried)."""
+    # pyusb maps libusb error codes to errno
+    code = ue.errno
+    if code == errno.ETIMEDOUT:
+        return USB_ERROR_TIMEOUT
+    if code == errno.EPIPE:
+        return USB_ERROR_PIPE
+    if code == errno.EOVERFLOW:
+        return USB_ERROR_OVERFLOW
+    if code == errno.ENODEV:
+        return USB_ERROR_DISCONNECT
+    return USB_ERROR_TRANSIENT
+
+
+class RecoveringThread(AbstractStoppableThread):
+    """Base of the RX/TX threads with classified USB error handling.
+
+    A stalled endpoint (pipe error) is cleared, overflows are handed to
+    :meth:`on_overflow`, other errors are retried after a short pause.
+    A disconnect or too many consecutive errors are fatal, the port is
+    marked closed (see :meth:`CP210xSerial.get_error_stats`). Any other
+    exception restarts the transfer loop, the buffers are kept."""
+
+    def __init__(self, serial, *args, **kwargs):
+        super(RecoveringThread, self).__init__(serial, *args, **kwargs)
+        self.reset_error_stats()
+
+    def reset_error_stats(self):
+        self.error_counts = collections.Counter()
+        self.num_restarts = 0
+        self.num_recoveries = 0
+        self.recovery_time = 0.0
+        self.max_recovery_time = 0.0
+        self._t_error = None
+        self._consecutive_errors = 0
+
+    def get_error_stats(self):
+        return {
+            "errors": dict(self.error_counts),
+            "restarts": self.num_restarts,
+            "recoveries": self.num_recoveries,
+            "recovery_time_mean": (
+                self.recovery_time / self.num_recoveries if self.num_recoveries else 0.0
+            ),
+            "recovery_time_max": self.max_recovery_time,
+        }
+
+    def run(self):
+        while self.shouldRun():
+            try:
+                self.runOne()
+            except libusb1.USBError as ue:
+                self.handle_usb_error(ue)
+            except Exception:
+                LOGGER.exception("Error in %s, restarting loop ...", self.name)
+                self.num_restarts += 1
+                self._error_begin()
+                time.sleep(RECOVERY_BACKOFF)
+
+    def _error_begin(self):
+        if self._t_error is None:
+            self._t_error = time.monotonic()
+        self._consecutive_errors += 1
+
+    def recovered(self):
+        """Call after a transfer went through (or timed out normally)."""
+        if self._t_error is None:
+            return
+        duration = time.monotonic() - self._t_error
+        self._t_error = None
+        self._consecutive_errors = 0
+        self.num_recoveries += 1
+        self.recovery_time += duration
+        self.max_recovery_time = max(self.max_recovery_time, duration)
+        LOGGER.info("%s recovered in %.1f ms.", self.name, duration * 1000)
+
+    def handle_usb_error(self, ue):
+        kind = classify_usb_error(ue)
+        self.error_counts[kind] += 1
+        if kind == USB_ERROR_TIMEOUT:
+            # e.g. TX blocked by flow control, just retry
+            return
+
+        self._error_begin()
+        LOGGER.warning(
+            "USB error in %s: %s (errno: %s, %s)", self.name, ue, ue.errno, kind
+        )
+        if (
+            kind == USB_ERROR_DISCONNECT
+            or self._consecutive_errors > MAX_CONSECUTIVE_ERRORS
+        ):
+            self.serial._fatal_error(ue)
+            return
+
+        if kind == USB_ERROR_PIPE:
+            try:
+                self.serial.device.clear_halt(self.endpoint.bEndpointAddress)
+            except libusb1.USBError as ue2:
+                LOGGER.warning("Clear halt failed: %s", ue2)
+                time.sleep(RECOVERY_BACKOFF)
+        elif kind == USB_ERROR_OVERFLOW:
+            self.on_overflow()
+        else:
+            time.sleep(RECOVERY_BACKOFF)
+
+    def on_overflow(self):
+        pass
+
+
 # TODO: r/w may not need to happen in chunks?
 
 
-class SerialBufferReadThread(AbstractStoppableThread):
-    def __init__(self, serial, endpoint, buffer, timeout=None, *args, **kwargs):
+class SerialBufferReadThread(RecoveringThread):
+    def __init__(
+        self, serial, endpoint, buffer, timeout=RX_POLL_TIMEOUT, *args, **kwargs
+    ):
+        kwargs.setdefault("name", "CP210x-RX")
         super(SerialBufferReadThread, self).__init__(serial, *args, **kwargs)
         self.endpoint = endpoint
         self.buffer = buffer
         self.timeout = timeout
+        #: transfer size, None for wMaxPacketSize
+        self.read_size = None
+        #: sleep after short transfer (sec)
+        self.idle_backoff = 0
+        self.reset_stats()
+
+    def apply_profile(self, profile):
+        """Apply transfer profile, see :func:`compute_transfer_profile`.
+        Takes effect with the next transfer, resets statistics."""
+        self.read_size = profile["read_size"]
+        self.timeout = profile["read_timeout"]
+        self.idle_backoff = profile["idle_backoff"]
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats_start = time.monotonic()
+        self.num_transfers = 0
+        self.num_bytes = 0
+        self.num_timeouts = 0
+        self.num_backoffs = 0
+
+    def get_stats(self):
+        duration = time.monotonic() - self.stats_start
+        return {
+            "duration": duration,
+            "transfers": self.num_transfers,
+            "bytes": self.num_bytes,
+            "timeouts": self.num_timeouts,
+            "backoffs": self.num_backoffs,
+            "transfers_per_sec": self.num_transfers / duration if duration else 0.0,
+            "bytes_per_transfer": (
+                self.num_bytes / self.num_transfers if self.num_transfers else 0.0
+            ),
+            "read_size": self.read_size or self.endpoint.wMaxPacketSize,
+            "read_timeout": self.timeout,
+            "idle_backoff": self.idle_backoff,
+        }
 
     def runOne(self):
         ser = self.serial
         device = ser.device
         endp = self.endpoint
         buf = self.buffer
+        read_size = self.read_size or endp.wMaxPacketSize
 
         data = None
         try:
-            data = device.read(endp.bEndpointAddress, endp.wMaxPacketSize, self.timeout)
-            RXTXLOGGER.debug("[RX] %s", hexline(data))
+            data = device.read(endp.bEndpointAddress, read_size, self.timeout)
+            # arrival time, before logging etc.
+            stamp = time.monotonic()
+            if RXTXLOGGER.isEnabledFor(logging.DEBUG):
+                RXTXLOGGER.debug("[RX] %s", hexline(data))
         except libusb1.USBError as ue:
-            # 110/-7 for timeout
+            # 110/-7 for timeout, others see handle_usb_error()
             if ue.errno != 110:
                 raise
+            self.num_timeouts += 1
             RXTXLOGGER.debug(
                 "RX Timeout: errno: %s, backend_error_code: %s",
                 ue.errno,
                 ue.backend_error_code,
             )
+        # endpoint works again
+        self.recovered()
         if data is not None:
-            buf.write(data)
-        # TODO: event
-
-
-class SerialBufferWriteThread(AbstractStoppableThread):
+            self.num_transfers += 1
+            self.num_bytes += len(data)
+            if ser._buffer_rx:
+                buf.write(data, stamp)
+            # raw stream taps (recorder, ...)
+            for sink in ser._rx_sinks:
+                sink.write(data, stamp)
+            # short transfer, let device FIFO fill up a bit
+            if self.idle_backoff and len(data) < read_size:
+                self.num_backoffs += 1
+                time.sleep(self.idle_backoff)
+
+    def on_overflow(self):
+        # device sent more than requested, retry with larger transfers
+        packet = self.endpoint.wMaxPacketSize
+        size = max(2 * (self.read_size or packet), packet)
+        self.read_size = min(MAX_TRANSFER_SIZE, size // packet * packet)
+        LOGGER.info("RX overflow, transfer size now %s", self.read_size)
+
+
+class SerialBufferWriteThread(RecoveringThread):
     def __init__(
         self, serial, endpoint, buffer, timeout=DEFAUL_TIMEOUT, *args, **kwargs
     ):
+        kwargs.setdefault("name", "CP210x-TX")
         super(SerialBufferWriteThread, self).__init__(serial, *args, **kwargs)
         self.endpoint = endpoint
         self.buffer = buffer
         self.timeout = timeout
+        #: bytes taken from buffer but not yet written
+        self.in_flight = 0
+        # chunk of a failed transfer, written again first
+        self._retry = None
+
+    def stop(self):
+        super(SerialBufferWriteThread, self).stop()
+        # wake up if waiting for data
+        with self.buffer.changed:
+            self.buffer.changed.notify_all()
 
     def runOne(self):
         ser = self.serial
@@ -387,16 +1491,40 @@ class SerialBufferWriteThread(AbstractStoppableThread):
         endp = self.endpoint
         buf = self.buffer
 
-        if not buf:
+        data, self._retry = self._retry, None
+        if data is None:
+            # highest priority lane with data, decided per transfer
             with buf.changed:
-                buf.changed.wait(self.timeout / 1000.0)
-
-        data = buf.read(endp.wMaxPacketSize)
-        if not data:
-            return
+                lane = self._next_lane()
+                if lane is None:
+                    buf.changed.wait(self.timeout / 1000.0)
+                    lane = self._next_lane()
+                if lane is None:
+                    return
+                t_queued = lane.buffer._time_at(0)
+                data = lane.buffer.read(self._transfer_size())
+                self.in_flight = len(data)
+            lane.record(
+                len(data), None if t_queued is None else time.monotonic() - t_queued
+            )
 
         RXTXLOGGER.debug("[TX] %s", hexline(data))
-        num = device.write(endp.bEndpointAddress, data, self.timeout)
+        pacer = ser._tx_pacer
+        if pacer is not None:
+            pacer.wait(len(data))
+        try:
+            num = device.write(endp.bEndpointAddress, data, self.timeout)
+        except libusb1.USBError:
+            # single packet, either sent or not, keep for retry (in flight)
+            self._retry = data
+            raise
+        self.recovered()
+        if pacer is not None:
+            pacer.completed(num, time.monotonic())
+        # wake up drain()
+        with buf.changed:
+            self.in_flight = 0
+            buf.changed.notify_all()
 
         if num < len(data):
             RXTXLOGGER.error(
@@ -408,14 +1536,216 @@ class SerialBufferWriteThread(AbstractStoppableThread):
 
         # TODO: event
 
+    def _transfer_size(self):
+        size = self.endpoint.wMaxPacketSize
+        pacer = self.serial._tx_pacer
+        if pacer is not None:
+            # target FIFO, never more than burst bytes per transfer
+            size = max(1, min(size, pacer.burst))
+        return size
+
+    def _next_lane(self):
+        for lane in self.serial._tx_lanes:
+            if lane.buffer:
+                return lane
+        return None
+
+
+class TransactionThread(AbstractStoppableThread):
+    """Match responses in the RX buffer to pipelined commands, in order,
+    see :meth:`CP210xSerial.transact`.
+
+    Commands are numbered in send order, responses in arrival order.
+    Every command times out on its own deadline, but stays in the queue
+    as stale, so its late response is discarded instead of being matched
+    to the next command. A stale command at the head is given up after
+    :data:`TRANSACT_STALE_TIMEOUT` (response lost). The in-flight slot
+    of a command is released once it leaves the queue."""
+
+    def __init__(self, serial, *args, **kwargs):
+        kwargs.setdefault("name", "CP210x-transact")
+        super(TransactionThread, self).__init__(serial, *args, **kwargs)
+        #: (seq, future, terminator, deadline, t_sent), send order
+        self.pending = collections.deque()
+        #: timed out commands still in pending, seq -> expiry
+        self.stale = dict()
+        self.cond = threading.Condition()
+        self._seq = 0
+        # head of pending and since when it is waited for
+        self._head = (None, None)
+        self.num_stale = 0
+
+    def next_seq(self):
+        # cond held
+        self._seq += 1
+        return self._seq
+
+    def stop(self):
+        super(TransactionThread, self).stop()
+        with self.cond:
+            self.cond.notify_all()
+
+    def run(self):
+        while self.shouldRun():
+            try:
+                self.runOne()
+            except Exception:
+                LOGGER.exception("Error in %s, restarting loop ...", self.name)
+                time.sleep(RECOVERY_BACKOFF)
+
+    def runOne(self):
+        ser = self.serial
+        buf = ser._buf_in
+
+        with self.cond:
+            now = time.monotonic()
+            expired = self._expire(now)
+            if self.pending:
+                entry = self.pending[0]
+                if self._head[0] != entry[0]:
+                    self._head = (entry[0], now)
+                stale_until = self.stale.get(entry[0])
+                if stale_until is not None:
+                    # its response may queue behind those of earlier ones
+                    stale_until = max(
+                        stale_until, self._head[1] + TRANSACT_STALE_TIMEOUT
+                    )
+                wake = self._next_deadline(stale_until)
+            else:
+                entry = None
+                self.cond.wait(DEFAUL_TIMEOUT / 1000.0)
+
+        for _, future, _, _, _ in expired:
+            self._fail(future, concurrent.futures.TimeoutError("No response in time"))
+        if entry is None:
+            return
+        seq, future, terminator, _, _ = entry
+
+        with buf.changed:
+            while not buf.contains(terminator):
+                delay = DEFAUL_TIMEOUT / 1000.0
+                if wake is not None:
+                    delay = min(delay, wake - time.monotonic())
+                if delay <= 0 or self.should_stop or not ser.is_open:
+                    break
+                buf.changed.wait(delay)
+            else:
+                data, _, t_last = buf.read_until_with_timestamps(terminator)
+                if stale_until is not None:
+                    self._pop(entry)
+                    self.num_stale += 1
+                    LOGGER.debug("Discarded late response of command #%s", seq)
+                else:
+                    self._done(entry, data, t_last)
+                return
+
+        if stale_until is not None and time.monotonic() >= stale_until:
+            # response lost, expect responses of next commands
+            self._pop(entry)
+
+    def _expire(self, now):
+        # cond held, mark commands past their deadline stale
+        expired = list()
+        for entry in self.pending:
+            seq, deadline = entry[0], entry[3]
+            if seq not in self.stale and deadline is not None and now >= deadline:
+                self.stale[seq] = now + TRANSACT_STALE_TIMEOUT
+                expired.append(entry)
+        return expired
+
+    def _next_deadline(self, stale_until):
+        # cond held, earliest time something is due
+        deadlines = [
+            entry[3]
+            for entry in self.pending
+            if entry[3] is not None and entry[0] not in self.stale
+        ]
+        if stale_until is not None:
+            deadlines.append(stale_until)
+        return min(deadlines) if deadlines else None
+
+    def _pop(self, entry):
+        with self.cond:
+            if not self.pending or self.pending[0] is not entry:
+                # cancelled (port closed)
+                return False
+            self.pending.popleft()
+            self.stale.pop(entry[0], None)
+        self.serial._transact_slots.release()
+        return True
+
+    def _done(self, entry, data, t_last):
+        _, future, _, _, t_sent = entry
+        if not self._pop(entry):
+            return
+        if future.done():
+            # cancelled by caller, response consumed anyway
+            return
+        try:
+            # arrival time of terminator (RX thread), not wake-up time
+            future.latency = (t_last or time.monotonic()) - t_sent
+            self.serial._record_transact(future.latency)
+            future.set_result(data)
+        except concurrent.futures.InvalidStateError:
+            # cancelled meanwhile
+            pass
+
+    def _fail(self, future, error):
+        if future.done():
+            return
+        try:
+            future.latency = None
+            self.serial._record_transact(None)
+            future.set_exception(error)
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    def cancel_all(self, error):
+        with self.cond:
+            pending, self.pending = self.pending, collections.deque()
+            self.stale.clear()
+        for _, future, _, _, _ in pending:
+            self.serial._transact_slots.release()
+            try:
+                future.set_exception(error)
+            except concurrent.futures.InvalidStateError:
+                pass
+
 
 class CP210xSerial:
-    def __init__(self, device, baudRate=DEFAULT_BAUDRATE):
+    def __init__(
+        self,
+        device,
+        baudRate=DEFAULT_BAUDRATE,
+        profile=None,
+        status_ttl=0.0,
+        tx_buffer_size=DEFAULT_TX_BUFFER_SIZE,
+        rx_store_size=DEFAULT_RX_STORE_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        buffer_rx=True,
+    ):
         assert self.is_usb_cp210x(device), "Unknown CP210x device!"
         self._device = device
         self._intf = 0
 
+        # control transfers, status caches + latency
+        self._ctrl_stats = dict()
+        self._ctrl_stats_lock = threading.Lock()
+        self._status_ttl = status_ttl
+        self._status_caches = {
+            request: StatusCache(
+                lambda request=request, blen=blen: self.recv_ctrl_cmd(request, blen),
+                status_ttl,
+            )
+            for request, blen in (
+                (CP210x_GET_MDMSTS, 1),
+                (CP210x_GET_COMM_STATUS, 19),
+                (CP210x_GET_LINE_CTL, 2),
+            )
+        }
+
         self._baudRate = baudRate
+        self._profile = profile
         self._rtsCts_enabled = False
         self._dtrDsr_enabled = False
         self._cts_state = False
@@ -424,10 +1754,49 @@ class CP210xSerial:
 
         self._is_open = False
         self._is_async = False
-        self._buf_in = Buffer()
-        self._buf_out = Buffer()
+        self.close_stats = None
+        #: fatal USB error that closed the port (RX/TX thread)
+        self.last_error = None
+        self._buf_in = Buffer(timestamps=True)
+        self._buf_out = Buffer(timestamps=True, maxsize=tx_buffer_size)
+        # TX priority lanes, index is priority, normal lane is _buf_out
+        #   all share its lock/condition so the TX thread waits on one
+        self._tx_lanes = [
+            TxLane(
+                priority,
+                (
+                    self._buf_out
+                    if priority == PRIORITY_NORMAL
+                    else Buffer(
+                        timestamps=True, maxsize=tx_buffer_size, shared=self._buf_out
+                    )
+                ),
+            )
+            for priority in TX_PRIORITIES
+        ]
         self._thrd_buf_in = None
         self._thrd_buf_out = None
+        self._rx_sinks = list()
+        # False: RX data only goes to sinks (e.g. forwarders), not read()
+        self._buffer_rx = buffer_rx
+        # multi-subscriber RX store, created on first subscribe()
+        self._rx_store = None
+        self._rx_store_size = rx_store_size
+
+        # event handlers, see add_event_handler()
+        self._events = None
+
+        # TX pacing (no flow control), see set_tx_pacing()
+        self._tx_pacer = None
+        self._tx_utilization = 1.0
+
+        # pipelined command/response, see transact()
+        self._thrd_transact = None
+        self._transact_lock = threading.Lock()
+        # keeps queue order = write order, held while writing
+        self._transact_send_lock = threading.Lock()
+        self._transact_slots = threading.BoundedSemaphore(max_in_flight)
+        self._transact_stats = [0, 0, 0.0, 0.0]
 
     @staticmethod
     def is_usb_cp210x(device):
@@ -462,30 +1831,72 @@ class CP210xSerial:
 
     # --------------------------------
 
-    def send_ctrl_cmd(self, request, value=0, data=None, intf=0):
-        ret = self._device.ctrl_transfer(
-            CP210x_REQTYPE_HOST2DEVICE,
-            request,
-            wValue=value,
-            wIndex=intf,
-            data_or_wLength=data,
-            timeout=None,
-        )
+    def send_ctrl_cmd(self, request, value=0, data=None, intf=0, timeout=None):
+        t_start = time.monotonic()
+        try:
+            ret = self._device.ctrl_transfer(
+                CP210x_REQTYPE_HOST2DEVICE,
+                request,
+                wValue=value,
+                wIndex=intf,
+                data_or_wLength=data,
+                timeout=timeout,
+            )
+        finally:
+            self._record_ctrl_latency(request, time.monotonic() - t_start)
+            # any setting may change the device state
+            for cache in self._status_caches.values():
+                cache.invalidate()
         return ret
 
     def recv_ctrl_cmd(self, request, blen, value=0, intf=0):
         buf = usb.util.create_buffer(blen)
-        ret = self._device.ctrl_transfer(
-            CP210x_REQTYPE_DEVICE2HOST,
-            request,
-            wValue=value,
-            wIndex=intf,
-            data_or_wLength=buf,
-            timeout=None,
-        )
-        print("recv:", ret, buf)
+        t_start = time.monotonic()
+        try:
+            ret = self._device.ctrl_transfer(
+                CP210x_REQTYPE_DEVICE2HOST,
+                request,
+                wValue=value,
+                wIndex=intf,
+                data_or_wLength=buf,
+                timeout=None,
+            )
+        finally:
+            self._record_ctrl_latency(request, time.monotonic() - t_start)
+        if ret < blen:
+            LOGGER.debug("recv (0x%02x): short read %s of %s", request, ret, blen)
         return buf
 
+    def _record_ctrl_latency(self, request, duration):
+        with self._ctrl_stats_lock:
+            stats = self._ctrl_stats.get(request)
+            if stats is None:
+                stats = self._ctrl_stats[request] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+    def get_ctrl_stats(self):
+        """Control transfer latency per request code, dict of
+        ``request: {"count", "mean", "max"}`` (seconds)."""
+        with self._ctrl_stats_lock:
+            return {
+                request: {"count": num, "mean": total / num, "max": max_}
+                for request, (num, total, max_) in self._ctrl_stats.items()
+            }
+
+    @property
+    def status_ttl(self):
+        """Max age in seconds of cached modem/comm status and line
+        control values, 0 still shares a transfer in flight."""
+        return self._status_ttl
+
+    @status_ttl.setter
+    def status_ttl(self, ttl):
+        self._status_ttl = ttl
+        for cache in self._status_caches.values():
+            cache.ttl = ttl
+
     # --------------------------------
 
     def set_baudRate(self, baudRate):
@@ -493,6 +1904,9 @@ class CP210xSerial:
         ret = self.send_ctrl_cmd(CP210x_SET_BAUDRATE, 0, data)
         if ret >= 0:
             self._baudRate = baudRate
+            # profile parameters depend on baud rate
+            self._apply_profile()
+            self._update_tx_pacer()
         return ret
 
     def set_flowControl(self, flowControl):
@@ -519,7 +1933,8 @@ class CP210xSerial:
             ]
             self._rtsCts_enabled = False
             self._dtrDsr_enabled = False
-            self._stop_thread_flowControl()
+            # status thread may still be needed for events
+            self._update_thread_flowControl()
             return self.send_ctrl_cmd(CP210x_SET_FLOW, 0, dataOff)
         elif flowControl == FLOW_CONTROL_RTS_CTS:
             dataRtsCts = [
@@ -616,6 +2031,7 @@ class CP210xSerial:
         val |= dataBits << 8
 
         self.send_ctrl_cmd(CP210x_SET_LINE_CTL, val, None)
+        self._update_tx_pacer()
 
     def set_stopBits(self, stopBits):
         val = self.get_CTL()
@@ -631,6 +2047,7 @@ class CP210xSerial:
             return
 
         self.send_ctrl_cmd(CP210x_SET_LINE_CTL, val, None)
+        self._update_tx_pacer()
 
     def set_parity(self, parity):
         val = self.get_CTL()
@@ -648,6 +2065,7 @@ class CP210xSerial:
         val |= parity << 4
 
         self.send_ctrl_cmd(CP210x_SET_LINE_CTL, val, None)
+        self._update_tx_pacer()
 
     def set_break(self, on):
         if on:
@@ -667,19 +2085,61 @@ class CP210xSerial:
         else:
             self.send_ctrl_cmd(CP210x_SET_MHS, CP210x_MHS_DTR_OFF, None)
 
-    def get_modem_state(self):
-        buf = self.recv_ctrl_cmd(CP210x_GET_MDMSTS, 1)
-        return buf
+    def get_modem_state(self, max_age=None):
+        """Modem status (1 byte), cached, see :attr:`status_ttl`.
+        The returned buffer is shared, do not modify."""
+        return self._status_caches[CP210x_GET_MDMSTS].get(max_age)
 
-    def get_comm_status(self):
-        buf = self.recv_ctrl_cmd(CP210x_GET_COMM_STATUS, 19)
-        return buf
+    def get_comm_status(self, max_age=None):
+        """Comm status (19 bytes), cached, see :attr:`status_ttl`.
+        The returned buffer is shared, do not modify."""
+        return self._status_caches[CP210x_GET_COMM_STATUS].get(max_age)
 
-    def get_CTL(self):
-        buf = self.recv_ctrl_cmd(CP210x_GET_LINE_CTL, 2)
+    def get_CTL(self, max_age=None):
+        buf = self._status_caches[CP210x_GET_LINE_CTL].get(max_age)
         val = struct.unpack("<H", buf.tobytes())[0]
         return val
 
+    def get_frame_bits(self):
+        """Bits on the line per byte: start + data + parity + stop bits,
+        from the line control register."""
+        val = self.get_CTL()
+        data_bits = (val >> 8) & 0x0F
+        if data_bits not in (DATA_BITS_5, DATA_BITS_6, DATA_BITS_7, DATA_BITS_8):
+            data_bits = DATA_BITS_8
+        parity_bits = 1 if (val >> 4) & 0x0F else 0
+        stop_bits = {0: 1, 1: 1.5, 2: 2}.get(val & 0x03, 1)
+        return 1 + data_bits + parity_bits + stop_bits
+
+    def set_tx_pacing(self, enabled=True, burst=DEFAULT_TX_BURST, utilization=1.0):
+        """Meter TX to the line rate (baud rate / frame bits), for
+        targets without flow control and a small UART FIFO.
+
+        USB transfers are limited to burst bytes (target FIFO size),
+        at most burst bytes go out back to back. utilization < 1 leaves
+        idle time on the line for slow targets. Follows baud rate and
+        line control changes. Achieved rate see :meth:`get_tx_pacing_stats`.
+        """
+        if not enabled:
+            self._tx_pacer = None
+            return
+        self._tx_utilization = utilization
+        self._tx_pacer = TxPacer(self._tx_pacing_rate(), burst)
+
+    def _tx_pacing_rate(self):
+        return self._baudRate / float(self.get_frame_bits()) * self._tx_utilization
+
+    def _update_tx_pacer(self):
+        if self._tx_pacer is not None:
+            self._tx_pacer.rate = self._tx_pacing_rate()
+
+    def get_tx_pacing_stats(self):
+        """Configured and achieved TX rate in bytes/sec (measured from
+        completed transfers while paced), number and time of pacing
+        waits. None if pacing is off."""
+        pacer = self._tx_pacer
+        return pacer.get_stats() if pacer else None
+
     def purgeHWBuffer(self, rx, tx):
         # https://github.com/mik3y/usb-serial-for-android/blob/master/usbSerialForAndroid/src/main/java/com/hoho/android/usbserial/driver/Cp21xxSerialDriver.java#L304
         val = 0x00
@@ -707,6 +2167,14 @@ class CP210xSerial:
     def baudrate(self):
         return self._baudRate
 
+    @property
+    def profile(self):
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile):
+        self.set_profile(profile)
+
     @baudrate.setter
     def baudrate(self, baudRate):
         self.set_baudRate(baudRate)
@@ -716,7 +2184,7 @@ class CP210xSerial:
     # r/w
     # - async on buffers/queue with threads
 
-    def read(self, size=-1, timeout=None):
+    def read(self, size=-1, timeout=None, inter_byte_timeout=None, min_size=1):
         """Read size bytes from RX buffer.
 
         If size is negative, zero or None then read all data.
@@ -724,33 +2192,68 @@ class CP210xSerial:
         If timeout is None, then block read until size bytes read.
         If timeout is 0, then un-blocking, return as soon as read
         size bytes finished. Else timeout should be in seconds,
-        with possible fractions.
+        with possible fractions. If the port is closed or the device
+        is gone (see ``last_error``) the buffered rest is returned.
+
+        inter_byte_timeout (seconds) returns as soon as the line was
+        idle that long after at least min_size bytes, e.g. to read
+        unterminated bursts (like termios VMIN/VTIME). Idle time is
+        measured from the RX arrival time of the last byte. With
+        inter_byte_timeout a size of -1 reads the whole burst.
+        """
+        return self.read_with_timestamps(size, timeout, inter_byte_timeout, min_size)[0]
+
+    def read_with_timestamps(
+        self, size=-1, timeout=None, inter_byte_timeout=None, min_size=1
+    ):
+        """Read size bytes from RX buffer, see :meth:`read`.
+
+        Returns a tuple ``(data, time_first, time_last)`` with the
+        arrival times (``time.monotonic()``) of the first and last byte
+        as received by the RX thread. Times are None if no data.
         """
         # TODO: check async
 
         buf = self._buf_in
+        if inter_byte_timeout is not None:
+            if not size or size <= 0:
+                size = -1
+            with buf.changed, Timeout(timeout) as to:
+                self._wait_rx(
+                    lambda: 0 < size <= len(buf), to, inter_byte_timeout, min_size
+                )
+                return buf.read_with_timestamps(size)
+
         if not size or size <= 0:
-            return buf.read(size)
+            return buf.read_with_timestamps(size)
 
         with Timeout(timeout) as to:
             data = bytearray()
-            data += buf.read(size)
+            chunk, t_first, t_last = buf.read_with_timestamps(size)
+            data += chunk
 
             while not to.expired() and size > len(data):
-                if not buf:
-                    # wait for more, delay
-                    delay = to.time_left()
-                    if delay is None:
-                        delay = 1000
-                    with buf.changed:
-                        buf.changed.wait(delay / 1000.0)
+                with buf.changed:
+                    if not buf:
+                        if not self._is_open:
+                            # closed or device gone, return what we got
+                            break
+                        # wait for more, delay (sec)
+                        delay = to.time_left()
+                        if delay is None:
+                            delay = DEFAUL_TIMEOUT / 1000.0
+                        buf.changed.wait(delay)
                 rlen = size - len(data)
-                chunk = buf.read(rlen)
+                chunk, t_chunk_first, t_chunk_last = buf.read_with_timestamps(rlen)
+                if chunk:
+                    if t_first is None:
+                        t_first = t_chunk_first
+                    t_last = t_chunk_last
                 data += chunk
 
             # TODO: convert to single byte if array len is 1?
 
-            return data
+            return data, t_first, t_last
 
         # while buf:
         #     frag = buf.read(1024)
@@ -759,7 +2262,85 @@ class CP210xSerial:
         #     data.extend(frag)
         # return data
 
-    def read_until(self, expected=b"\n", size=None, timeout=None):
+    def _wait_rx(self, done, to, inter_byte_timeout=None, min_size=1):
+        """Wait on RX buffer (lock held) until done(), timeout or, with
+        inter_byte_timeout (sec), the line was idle that long after at
+        least min_size bytes. Idle time is taken from the arrival time
+        of the newest byte (RX thread timestamps), a condition wait up
+        to that deadline, no polling. Returns done()."""
+        buf = self._buf_in
+        min_size = max(1, min_size)
+        while not done():
+            if to.expired():
+                return False
+            delay = to.time_left()
+            if delay is None:
+                if not self._is_open:
+                    return False
+                delay = DEFAUL_TIMEOUT / 1000.0
+            if inter_byte_timeout is not None and len(buf) >= min_size:
+                t_last = buf._time_at(len(buf) - 1)
+                if t_last is not None:
+                    idle_left = t_last + inter_byte_timeout - time.monotonic()
+                    if idle_left <= 0:
+                        return False
+                    delay = min(delay, idle_left)
+            buf.changed.wait(delay)
+        return True
+
+    def read_samples(
+        self, dtype="<i2", count=1, timeout=None, channels=1, inter_byte_timeout=None
+    ):
+        """Read count binary samples (per channel) from RX buffer.
+
+        dtype is a numpy dtype string, little-endian by default (e.g.
+        ``"<i2"``, ``"<f4"``). Waits for ``count * channels`` whole
+        samples, timeout and inter_byte_timeout like :meth:`read`; on
+        timeout fewer (whole) samples are returned, a partial sample
+        stays in the buffer.
+
+        Returns a :class:`numpy.ndarray` over the read bytes (no
+        conversion copy), shape ``(count, channels)`` for interleaved
+        channels. Without numpy an :class:`array.array` with the
+        interleaved samples is returned (channel c: ``a[c::channels]``).
+        """
+        np = _get_numpy()
+        if np is not None:
+            dtype = np.dtype(dtype)
+            itemsize, typecode, swap = dtype.itemsize, None, False
+        else:
+            typecode, swap = sample_typecode(dtype)
+            itemsize = array.array(typecode).itemsize
+
+        frame = itemsize * channels
+        size = count * frame
+        buf = self._buf_in
+        with buf.changed, Timeout(timeout) as to:
+            self._wait_rx(lambda: len(buf) >= size, to, inter_byte_timeout, frame)
+            # whole frames only
+            size = min(size, len(buf) // frame * frame)
+            data = buf.read(size) if size else bytearray()
+
+        if np is not None:
+            samples = np.frombuffer(data, dtype=dtype)
+            if channels > 1:
+                samples = samples.reshape(-1, channels)
+            return samples
+
+        samples = array.array(typecode)
+        samples.frombytes(data)
+        if swap:
+            samples.byteswap()
+        return samples
+
+    def read_until(
+        self,
+        expected=b"\n",
+        size=None,
+        timeout=None,
+        return_time=False,
+        inter_byte_timeout=None,
+    ):
         """Read from RX buffer until chars found.
 
         This method may be helpful to read lines from a buffer, etc.
@@ -776,6 +2357,13 @@ class CP210xSerial:
         search is successful. None means to block until found or size
         limit is reached.
 
+        If return_time is True, a tuple ``(data, time_first,
+        time_last)`` with the arrival times of the first and last byte
+        is returned instead, see :meth:`read_with_timestamps`.
+
+        inter_byte_timeout (seconds) also returns (without the search
+        string) once the line was idle that long, see :meth:`read`.
+
         Note that a unlimited size (-1/None) and a blocking timeout
         (None) may never return if the search pattern is never found!
         """
@@ -790,29 +2378,60 @@ class CP210xSerial:
             expected_last = expected
 
         buf = self._buf_in
+        if inter_byte_timeout is not None:
+            if isinstance(expected, int):
+                expected = bytes((expected,))
+            # search only new data
+            pos = [0]
+
+            def found():
+                if buf.buf.find(expected, pos[0]) != -1:
+                    return True
+                pos[0] = max(0, len(buf) - len(expected) + 1)
+                return 0 < size <= len(buf)
+
+            with buf.changed, Timeout(timeout) as to:
+                self._wait_rx(found, to, inter_byte_timeout)
+                data, t_first, t_last = buf.read_until_with_timestamps(expected, size)
+            if return_time:
+                return data, t_first, t_last
+            return data
+
         with Timeout(timeout) as to:
             data = bytearray()
-            data += buf.read_until(expected, size)
+            chunk, t_first, t_last = buf.read_until_with_timestamps(expected, size)
+            data += chunk
 
             # read in loop, blocking
             while not to.expired() and data.find(expected) == -1:
                 if size > 0 and size <= len(data):
                     break
 
-                if not buf:
-                    # wait for more, delay
-                    delay = to.time_left()
-                    if delay is None:
-                        delay = DEFAUL_TIMEOUT
-                    with buf.changed:
-                        buf.changed.wait(delay / 1000.0)
+                with buf.changed:
+                    if not buf:
+                        if not self._is_open:
+                            # closed or device gone, return what we got
+                            break
+                        # wait for more, delay (sec)
+                        delay = to.time_left()
+                        if delay is None:
+                            delay = DEFAUL_TIMEOUT / 1000.0
+                        buf.changed.wait(delay)
                 if size > 0:
                     rlen = size - len(data)
                 else:
                     rlen = size
-                chunk = buf.read_until(expected_last, rlen)
+                chunk, t_chunk_first, t_chunk_last = buf.read_until_with_timestamps(
+                    expected_last, rlen
+                )
+                if chunk:
+                    if t_first is None:
+                        t_first = t_chunk_first
+                    t_last = t_chunk_last
                 data += chunk
 
+        if return_time:
+            return data, t_first, t_last
         return data
 
     def read_until_or_none(self, expected=b"\n", size=None, timeout=None):
@@ -847,12 +2466,15 @@ class CP210xSerial:
                 if size > 0 and size < len(buf):
                     break
 
-                # wait for more, delay
+                # wait for more, delay (sec)
                 delay = to.time_left()
                 if delay is None:
-                    delay = DEFAUL_TIMEOUT
+                    delay = DEFAUL_TIMEOUT / 1000.0
                 with buf.changed:
-                    buf.changed.wait(delay / 1000.0)
+                    if not buf.contains(expected):
+                        if not self._is_open:
+                            break
+                        buf.changed.wait(delay)
 
         if not buf.contains(expected):
             return None
@@ -880,6 +2502,8 @@ class CP210xSerial:
             return True
 
         with self._buf_in.changed:
+            if not self._is_open:
+                return False
             return self._buf_in.changed.wait(duration)
 
     def wait_on_write_buffer(self, duration):
@@ -889,18 +2513,326 @@ class CP210xSerial:
         If TX buffer contains data after timeout return False, else
         True if empty.
         """
-        if not self._buf_out:
+        if not self._tx_queued():
             return True
 
         with self._buf_out.changed:
             self._buf_out.changed.wait(duration)
 
-        return not self._buf_out
+        return not self._tx_queued()
 
-    def write(self, data):
+    def set_profile(self, profile):
+        """Set RX transfer profile, one of :data:`PORT_PROFILES`
+        (``low_latency``, ``throughput``, ``power_save``) or None for
+        the default (single packet, :data:`RX_POLL_TIMEOUT`).
+
+        Can be switched at runtime on an open port, parameters are
+        derived from the current baud rate, see
+        :func:`compute_transfer_profile`. Resets RX statistics."""
+        if profile is not None and profile not in PORT_PROFILES:
+            raise ValueError("Unknown port profile: {}".format(profile))
+        self._profile = profile
+        self._apply_profile()
+
+    def _apply_profile(self):
+        thrd = self._thrd_buf_in
+        if not thrd:
+            return
+        if self._profile is None:
+            thrd.apply_profile(
+                {"read_size": None, "read_timeout": RX_POLL_TIMEOUT, "idle_backoff": 0}
+            )
+        else:
+            thrd.apply_profile(
+                compute_transfer_profile(
+                    self._profile, self._baudRate, thrd.endpoint.wMaxPacketSize
+                )
+            )
+
+    def get_rx_stats(self):
+        """RX thread statistics since start or last profile change,
+        e.g. to compare profiles (transfers/sec, bytes/transfer)."""
+        if not self._thrd_buf_in:
+            return None
+        stats = self._thrd_buf_in.get_stats()
+        stats["profile"] = self._profile
+        return stats
+
+    def subscribe(self, policy=SUBSCRIBER_BLOCK):
+        """Subscribe to the RX stream, non-destructive.
+
+        Each subscriber has its own cursor on a shared store (see
+        :class:`SharedBuffer`) and reads independently of other
+        subscribers and of :meth:`read`. policy decides what happens if
+        it lags behind by more than the store size: ``block`` the RX
+        thread or ``drop`` data (recorded as gap)."""
+        if self._rx_store is None:
+            self._rx_store = SharedBuffer(self._rx_store_size)
+            self.add_rx_sink(self._rx_store)
+        return self._rx_store.subscribe(policy)
+
+    def set_event_dispatcher(self, dispatcher):
+        """Use dispatcher (e.g. ``EventDispatcher(loop=loop)`` or with a
+        shared executor) for event handlers, replaces the current one
+        including its handlers."""
+        if self._events is not None:
+            self.remove_rx_sink(self._events)
+            self._events.close()
+        self._events = dispatcher
+        self.add_rx_sink(dispatcher)
+        self._update_thread_flowControl()
+
+    def add_event_handler(self, kind, callback, delimiter=None):
+        """Call callback(event) for serial events, see :class:`SerialEvent`.
+
+        kind is one of :data:`EVENT_KINDS`: ``data`` received,
+        ``delimiter`` seen in the RX stream (delimiter bytes required),
+        ``modem`` line change (CTS, DSR, RI, DCD) or ``line_error``
+        (break, framing, overrun, parity). Modem lines and errors are
+        polled by the status thread. Handlers run on the event
+        dispatcher (default: own worker thread), never on the USB
+        threads, see :meth:`set_event_dispatcher`."""
+        if self._events is None:
+            self.set_event_dispatcher(EventDispatcher())
+        self._events.add_handler(kind, callback, delimiter)
+        self._update_thread_flowControl()
+
+    def remove_event_handler(self, kind, callback):
+        if self._events is None:
+            return
+        self._events.remove_handler(kind, callback)
+        self._update_thread_flowControl()
+
+    def get_event_stats(self):
+        """Event counts and queue delay (p50/p99/max, seconds), None
+        without event handlers."""
+        return self._events.get_stats() if self._events else None
+
+    def add_rx_sink(self, sink):
+        """Register a raw RX stream sink.
+
+        A sink is any object with a ``write(data, timestamp)`` method,
+        it will be called by the RX thread for each received transfer
+        (after it has been added to the RX buffer). The call should be
+        fast as it delays the next USB read. With ``buffer_rx=False``
+        RX data goes to the sinks only (forwarders, no local reads)."""
+        # copy on write, RX thread iterates without lock
+        self._rx_sinks = self._rx_sinks + [sink]
+
+    def remove_rx_sink(self, sink):
+        self._rx_sinks = [s for s in self._rx_sinks if s is not sink]
+
+    def write(self, data, timeout=None, priority=PRIORITY_NORMAL):
+        """Queue data in the (bounded) TX buffer.
+
+        If the TX buffer is full, block until there is space. timeout
+        None blocks until all data is queued (or the port is closed), 0
+        is non-blocking, else timeout in seconds. Returns the number of
+        bytes queued, may be less than len(data) on timeout.
+
+        priority selects the TX lane (see :data:`TX_PRIORITIES`), each
+        lane has its own buffer. The TX thread picks the highest
+        priority lane with data for every transfer, so e.g. a short
+        ``PRIORITY_HIGH`` command goes out with the next transfer even
+        during a large upload, see :meth:`get_tx_lane_stats`.
+        """
         # TODO: check async
 
-        self._buf_out.write(data)
+        lane = self._tx_lane(priority)
+        with lane.lock, Timeout(timeout) as to:
+            return self._queue_tx(as_byte_view(data), to, lane.buffer)
+
+    def writev(self, buffers, timeout=None, priority=PRIORITY_NORMAL):
+        """Queue a sequence of bytes-like fragments (e.g. header,
+        payload memoryview, CRC) in the TX buffer, like
+        ``write(b"".join(buffers))`` but without the joined copy.
+
+        Fragments of one call are not interleaved with other writers.
+        See :meth:`write` for timeout and priority, returns number of
+        bytes queued.
+        """
+        views = [as_byte_view(data) for data in buffers]
+        total = sum(len(view) for view in views)
+
+        lane = self._tx_lane(priority)
+        buf = lane.buffer
+        with lane.lock, Timeout(timeout) as to:
+            # fast path, all fits
+            with buf.lock:
+                space = buf.space()
+                if space is None or space >= total:
+                    return buf.writev(views)
+
+            queued = 0
+            for view in views:
+                num = self._queue_tx(view, to, buf)
+                queued += num
+                if num < len(view):
+                    break
+        return queued
+
+    def _tx_lane(self, priority):
+        if priority not in TX_PRIORITIES:
+            raise ValueError("Unknown TX priority: {}".format(priority))
+        return self._tx_lanes[priority]
+
+    def _tx_queued(self):
+        return sum(len(lane.buffer) for lane in self._tx_lanes)
+
+    def _queue_tx(self, view, to, buf):
+        total, queued = len(view), 0
+        while queued < total:
+            with buf.changed:
+                space = buf.space()
+                if space is None:
+                    space = total - queued
+                if space > 0:
+                    num = min(space, total - queued)
+                    buf.write(view[queued : queued + num])
+                    queued += num
+                    continue
+
+                # full, wait for TX thread (only if it can drain)
+                if to.expired() or not self._is_open:
+                    break
+                delay = to.time_left()
+                if delay is None:
+                    delay = DEFAUL_TIMEOUT / 1000.0
+                buf.changed.wait(delay)
+
+        return queued
+
+    def drain(self, timeout=None):
+        """Wait until the host TX buffer is empty and the last transfer
+        is done. Returns False on timeout (seconds, None to block)."""
+        buf = self._buf_out
+        with Timeout(timeout) as to:
+            with buf.changed:
+                while self._tx_queued() or (
+                    self._thrd_buf_out and self._thrd_buf_out.in_flight
+                ):
+                    if to.expired() or not self._is_open:
+                        return False
+                    delay = to.time_left()
+                    if delay is None:
+                        delay = DEFAUL_TIMEOUT / 1000.0
+                    buf.changed.wait(delay)
+        return True
+
+    def get_tx_lane_stats(self):
+        """Per TX lane (list, index is priority): queued bytes (depth),
+        bytes and transfers sent, queue delay (queued to transfer
+        start) p50/p99/max in seconds."""
+        return [lane.get_stats() for lane in self._tx_lanes]
+
+    def clear_tx(self):
+        """Discard data queued in all TX lanes (host side)."""
+        for lane in self._tx_lanes:
+            lane.buffer.clear()
+
+    def get_tx_queue_device(self):
+        """Number of bytes in the chip's outbound (TX) queue, fresh
+        ``GET_COMM_STATUS`` (``ulAmountInOutQueue``)."""
+        status = self.get_comm_status(max_age=0)
+        return struct.unpack_from("<I", status, 12)[0]
+
+    def flush(self, timeout=None):
+        """Wait until all data has physically left the UART.
+
+        :meth:`drain` the host buffer, then poll the chip's outbound
+        queue until empty. Returns False on timeout (seconds, None to
+        block)."""
+        with Timeout(timeout) as to:
+            if not self.drain(to.time_left()):
+                return False
+
+            while True:
+                pending = self.get_tx_queue_device()
+                if not pending:
+                    return True
+                if to.expired():
+                    return False
+                # time to send pending bytes (10 bits per char), min 1ms
+                delay = max(pending * 10.0 / self._baudRate, 1 / 1000.0)
+                left = to.time_left()
+                time.sleep(delay if left is None else min(delay, left))
+
+    # - pipelined command/response
+
+    def transact(self, cmd, terminator=DEFAULT_TERMINATOR, timeout=None):
+        """Send command and return a :class:`concurrent.futures.Future`
+        for the response (bytes up to and including terminator).
+
+        Up to ``max_in_flight`` commands are pipelined (blocks if more),
+        responses are matched to commands in order. timeout (seconds,
+        from queuing the command) fails the future with a TimeoutError,
+        None waits forever. The future has a ``seq`` (command number)
+        and a ``latency`` attribute (seconds until the terminator
+        arrived) once done. A timed out or cancelled command still
+        holds its slot and consumes its response, a response arriving
+        late (within :data:`TRANSACT_STALE_TIMEOUT`) is discarded. Do not use
+        :meth:`read` etc. concurrently, it would steal responses.
+        """
+        if not self._is_open:
+            raise IOError("Port not open!")
+
+        # released when the command leaves the matcher queue
+        self._transact_slots.acquire()
+        future = concurrent.futures.Future()
+
+        with self._transact_lock:
+            thrd = self._thrd_transact
+            if thrd is None or not thrd.is_alive():
+                thrd = self._thrd_transact = TransactionThread(self)
+                thrd.start()
+
+        # queue and write together, keeps write and response order
+        #   (stats lock not held, the matcher needs it)
+        with self._transact_send_lock:
+            with thrd.cond:
+                t_sent = time.monotonic()
+                deadline = None if timeout is None else t_sent + timeout
+                future.seq = thrd.next_seq()
+                thrd.pending.append((future.seq, future, terminator, deadline, t_sent))
+                thrd.cond.notify_all()
+            # matcher may wait on RX data, recheck deadlines
+            with self._buf_in.changed:
+                self._buf_in.changed.notify_all()
+            self.write(cmd)
+        return future
+
+    def _record_transact(self, latency):
+        stats = self._transact_stats
+        with self._transact_lock:
+            if latency is None:
+                stats[1] += 1
+                return
+            stats[0] += 1
+            stats[2] += latency
+            stats[3] = max(stats[3], latency)
+
+    def get_transact_stats(self):
+        """Pipelined transaction stats: count, timeouts, in_flight,
+        stale (discarded late responses), mean and max latency
+        (seconds)."""
+        thrd = self._thrd_transact
+        with self._transact_lock:
+            num, timeouts, total, max_ = self._transact_stats
+            return {
+                "count": num,
+                "timeouts": timeouts,
+                "in_flight": len(thrd.pending) if thrd else 0,
+                "stale": thrd.num_stale if thrd else 0,
+                "mean": total / num if num else None,
+                "max": max_,
+            }
+
+    def _stop_thread_transact(self):
+        thrd = self._thrd_transact
+        if thrd:
+            thrd.stop()
+            thrd.cancel_all(IOError("Port closed"))
+            self._thrd_transact = None
 
     # - sync
     # note: better to use buffers above?
@@ -926,28 +2858,47 @@ class CP210xSerial:
         return data
 
     def write_sync_chunked(self, data):
-        device = self._device
-        endp_out = CP210xSerial.get_endpoints(device)[1]
-
-        if isinstance(data, int):
-            data = bytearray([data])
-        elif not data:
-            return 0
-        else:
-            data = bytearray(data)
-
-        total = len(data)
+        endp_out = CP210xSerial.get_endpoints(self._device)[1]
+        return self.writev_sync((data,), endp_out.wMaxPacketSize)
 
-        while data:
-            slen = min(endp_out.wMaxPacketSize, len(data))
-            chunk = data[:slen]
-            sent = device.write(endp_out.bEndpointAddress, chunk)
-            if not sent:
-                break
+    def writev_sync(self, buffers, transfer_size=None):
+        """Write a sequence of bytes-like fragments synchronously.
 
-            data[:sent] = b""
+        Fragments are packed directly into USB transfer buffers of at
+        most transfer_size bytes (default :data:`MAX_TRANSFER_SIZE`),
+        no joined copy. Returns the number of bytes written, stops on a
+        short write.
+        """
+        device = self._device
+        endp_out = CP210xSerial.get_endpoints(device)[1]
 
-        return total - len(data)
+        if not transfer_size:
+            transfer_size = MAX_TRANSFER_SIZE
+
+        def send(chunk):
+            # array('B') is passed through by pyusb without conversion
+            return device.write(endp_out.bEndpointAddress, chunk)
+
+        total = 0
+        tbuf = array.array("B")
+        for data in buffers:
+            view = as_byte_view(data)
+            offset = 0
+            while offset < len(view):
+                num = min(transfer_size - len(tbuf), len(view) - offset)
+                tbuf.frombytes(view[offset : offset + num])
+                offset += num
+                if len(tbuf) == transfer_size:
+                    sent = send(tbuf)
+                    total += sent
+                    if sent < len(tbuf):
+                        return total
+                    del tbuf[:]
+
+        if tbuf:
+            total += send(tbuf)
+
+        return total
 
     def read_sync(self, size):
         device = self._device
@@ -963,14 +2914,15 @@ class CP210xSerial:
         device = self._device
         endp_out = CP210xSerial.get_endpoints(device)[1]
 
-        if isinstance(data, int):
-            data = bytearray([data])
-        elif not data:
+        view = as_byte_view(data)
+        if not view:
             return 0
-        else:
-            data = bytearray(data)
 
-        return device.write(endp_out.bEndpointAddress, data)
+        # single copy, array('B') is passed through by pyusb
+        buf = array.array("B")
+        buf.frombytes(view)
+
+        return device.write(endp_out.bEndpointAddress, buf)
 
     # --------------------------------
 
@@ -984,32 +2936,54 @@ class CP210xSerial:
             # msec
             self.delay = delay
 
+            # last modem status byte, for change events
+            self._modem = None
+
         def runOne(self):
             # wait delay
+            time.sleep(self.delay / 1000.0)
+            if not self.shouldRun():
+                return
 
             ser = self.serial
-            modemState = ser.get_modem_state()
-            commStatus = ser.get_comm_status()
+            events = ser._events
+            try:
+                modemState = ser.get_modem_state()
+                commStatus = ser.get_comm_status()
+            except libusb1.USBError as ue:
+                LOGGER.debug("Status poll failed: %s", ue)
+                return
 
             if ser._rtsCts_enabled:
-                new_cts_state = (modemState[0] & 0x10) == 0x10
+                new_cts_state = (modemState[0] & MODEM_CTS) == MODEM_CTS
                 if ser._cts_state != new_cts_state:
                     ser._cts_state = new_cts_state
-                    # TODO: cts callback
 
             if ser._dtrDsr_enabled:
-                new_dsr_state = (modemState[0] & 0x20) == 0x20
+                new_dsr_state = (modemState[0] & MODEM_DSR) == MODEM_DSR
                 if ser._dsr_state != new_dsr_state:
                     ser._dsr_state = new_dsr_state
-                    # TODO: dsr callback
 
-            has_parity_error = (commStatus[0] & 0x10) == 0x10
-            has_framinh_error = (commStatus[0] & 0x02) == 0x02
-            is_break_interrupt = (commStatus[0] & 0x01) == 0x01
-            has_overrun_error = ((commStatus[0] & 0x04) == 0x04) or (
-                (commStatus[0] & 0x8) == 0x08
-            )
-            # TODO: callbacks
+            if events is None:
+                return
+
+            modem = modemState[0]
+            if modem != self._modem:
+                # first poll is the baseline, no event
+                if self._modem is not None and events.wants(EVENT_MODEM):
+                    state = {name: bool(modem & mask) for name, mask in MODEM_LINES}
+                    state["changed"] = [
+                        name
+                        for name, mask in MODEM_LINES
+                        if (modem ^ self._modem) & mask
+                    ]
+                    events.emit(EVENT_MODEM, state=state)
+                self._modem = modem
+
+            errors = commStatus[0]
+            if errors and events.wants(EVENT_LINE_ERROR):
+                state = {name: bool(errors & mask) for name, mask in LINE_ERRORS}
+                events.emit(EVENT_LINE_ERROR, state=state)
 
     def _start_thread_flowControl(self):
         if self._thrd_flowControl:
@@ -1017,7 +2991,9 @@ class CP210xSerial:
                 return
             self._stop_thread_flowControl()
 
-        self._thrd_flowControl = CP210xSerial.FlowControlThread(self)
+        self._thrd_flowControl = CP210xSerial.FlowControlThread(
+            self, name="CP210x-status"
+        )
         self._thrd_flowControl.start()
 
     def _stop_thread_flowControl(self):
@@ -1025,6 +3001,19 @@ class CP210xSerial:
             self._thrd_flowControl.stop()
             self._thrd_flowControl = None
 
+    def _update_thread_flowControl(self):
+        # status polling for flow control and/or modem/line error events
+        events = self._events
+        if (
+            self._rtsCts_enabled
+            or self._dtrDsr_enabled
+            or (events is not None and events.wants(EVENT_MODEM, EVENT_LINE_ERROR))
+        ):
+            if self._is_open:
+                self._start_thread_flowControl()
+        else:
+            self._stop_thread_flowControl()
+
     def _start_threads_buffer_rw(self):
         start_in = start_out = True
         if self._thrd_buf_in:
@@ -1046,21 +3035,54 @@ class CP210xSerial:
 
         if start_in:
             self._thrd_buf_in = SerialBufferReadThread(self, endp_in, self._buf_in)
+            self._apply_profile()
             self._thrd_buf_in.start()
 
         if start_out:
             self._thrd_buf_out = SerialBufferWriteThread(self, endp_out, self._buf_out)
             self._thrd_buf_out.start()
 
-    def _stop_threads_buffer_rw(self):
-        if self._thrd_buf_in:
-            self._thrd_buf_in.stop()
-            self._thrd_buf_in.join()
-            self._thrd_buf_in = None
-        if self._thrd_buf_out:
-            self._thrd_buf_out.stop()
-            self._thrd_buf_out.join()
-            self._thrd_buf_out = None
+    def _fatal_error(self, error):
+        """Unrecoverable USB error in RX/TX thread (e.g. device gone),
+        mark port closed and wake up waiting readers/writers. Buffered
+        RX data can still be read, :meth:`close` cleans up."""
+        if self.last_error is not None:
+            return
+        LOGGER.error("Fatal USB error, port closed: %s", error)
+        self.last_error = error
+        self._is_open = False
+        for buf in (self._buf_in, self._buf_out):
+            with buf.changed:
+                buf.changed.notify_all()
+        if self._rx_store is not None:
+            self._rx_store.close()
+
+    def get_error_stats(self):
+        """USB error counts and recovery times of the RX/TX threads."""
+        stats = {"last_error": self.last_error}
+        for name, thrd in (("rx", self._thrd_buf_in), ("tx", self._thrd_buf_out)):
+            stats[name] = thrd.get_error_stats() if thrd else None
+        return stats
+
+    def _stop_threads_buffer_rw(self, timeout=None):
+        """Stop RX/TX threads, wait at most timeout seconds (all
+        together). Returns False if a thread did not stop in time."""
+        threads = [t for t in (self._thrd_buf_in, self._thrd_buf_out) if t]
+        # signal all first, then wait, transfers finish in parallel
+        for thrd in threads:
+            thrd.stop()
+        self._thrd_buf_in = self._thrd_buf_out = None
+
+        stopped = True
+        with Timeout(timeout) as to:
+            for thrd in threads:
+                if thrd is threading.current_thread():
+                    continue
+                thrd.join(to.time_left())
+                if thrd.is_alive():
+                    LOGGER.warning("Thread %s did not stop in time!", thrd.name)
+                    stopped = False
+        return stopped
 
     # --------------------------------
 
@@ -1114,82 +3136,244 @@ class CP210xSerial:
             intf=self._intf, baudRate=self._baudRate
         ), "Error setting up defaults"
         self._is_open = True
+        self.last_error = None
+        if self._rx_store is not None:
+            self._rx_store.closed = False
 
         if _async:
             self._is_async = _async
             self._start_threads_buffer_rw()
+        if self._events is not None:
+            self._update_thread_flowControl()
+
+    def read_dump_forever(
+        self,
+        output=None,
+        read_size=None,
+        buffer_size=1024 * 1024,
+        flush_interval=0.5,
+        rotate_size=None,
+    ):
+        """Dump raw RX data (sync, no RX thread) until Ctrl+C, device
+        disconnect or too many consecutive USB errors.
+
+        Writes raw bytes to output (filename or binary file object,
+        default ``sys.stdout.buffer``) through a large buffered writer
+        that is flushed every flush_interval seconds (also on a quiet
+        line). With a filename output files can be rotated by
+        rotate_size bytes, see :class:`DumpWriter`.
 
-    def read_dump_forever(self):
+        read_size is the USB transfer size, by default a multiple of
+        the endpoint packet size to reduce the number of transfers.
+
+        Returns a dict with statistics (also logged on exit).
+        """
         device = self._device
         endp_in = CP210xSerial.get_endpoints(device)[0]
 
-        while True:
-            try:
-                data = device.read(endp_in.bEndpointAddress, endp_in.wMaxPacketSize)
-                text = "".join([chr(v) for v in data])
-                print(text, end="", flush=True)
-            except libusb1.USBError:
-                pass
-            except KeyboardInterrupt:
-                break
+        if not read_size:
+            read_size = endp_in.wMaxPacketSize * 16
+        # reused transfer buffer
+        data = usb.util.create_buffer(read_size)
+        view = memoryview(data)
+        # timeout in msec, to flush on quiet line
+        timeout = max(1, int(flush_interval * 1000))
+
+        writer = DumpWriter(
+            output,
+            buffer_size=buffer_size,
+            flush_interval=flush_interval,
+            rotate_size=rotate_size,
+        )
+        num_transfers = num_timeouts = 0
+        errors = collections.Counter()
+        consecutive_errors = 0
+        t_start = time.monotonic()
+        try:
+            while True:
+                try:
+                    num = device.read(endp_in.bEndpointAddress, data, timeout)
+                except libusb1.USBError as ue:
+                    kind = classify_usb_error(ue)
+                    if kind == USB_ERROR_TIMEOUT:
+                        num_timeouts += 1
+                        writer.maybe_flush()
+                        continue
+                    errors[ue.errno] += 1
+                    consecutive_errors += 1
+                    LOGGER.warning("RX error: %s (errno: %s, %s)", ue, ue.errno, kind)
+                    if (
+                        kind == USB_ERROR_DISCONNECT
+                        or consecutive_errors > MAX_CONSECUTIVE_ERRORS
+                    ):
+                        LOGGER.error("Giving up dump: %s", ue)
+                        break
+                    # same recovery as the RX thread, no busy loop
+                    if kind == USB_ERROR_PIPE:
+                        try:
+                            device.clear_halt(endp_in.bEndpointAddress)
+                        except libusb1.USBError as ue2:
+                            LOGGER.warning("Clear halt failed: %s", ue2)
+                            time.sleep(RECOVERY_BACKOFF)
+                    else:
+                        time.sleep(RECOVERY_BACKOFF)
+                    writer.maybe_flush()
+                    continue
+                consecutive_errors = 0
+                num_transfers += 1
+                if num:
+                    writer.write(view[:num])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+
+        duration = time.monotonic() - t_start
+        stats = {
+            "bytes": writer.num_bytes,
+            "transfers": num_transfers,
+            "timeouts": num_timeouts,
+            "errors": dict(errors),
+            "duration": duration,
+            "throughput": writer.num_bytes / duration if duration > 0 else 0.0,
+            "files": writer.files,
+        }
+        LOGGER.info(
+            "Dumped %s bytes in %.1f sec (%.1f B/s), %s transfers, %s errors %s",
+            stats["bytes"],
+            duration,
+            stats["throughput"],
+            num_transfers,
+            sum(errors.values()),
+            stats["errors"],
+        )
+        return stats
 
-    def close(self):
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Close port, stop threads, disable UART, release interface.
+
+        Threads are given at most timeout seconds to finish their
+        current transfer (bounded by the RX poll timeout), they are
+        daemon threads so a stuck one will not block exit. The teardown
+        duration is logged and stored in ``close_stats``."""
+        if not self._is_open and self.last_error is None:
+            return
+
+        t_start = time.monotonic()
+        # stop threads before they start new transfers
+        self._is_open = False
+
+        stopped = True
         if self._is_async:
-            self._stop_threads_buffer_rw()
+            stopped = self._stop_threads_buffer_rw(timeout)
         self._stop_thread_flowControl()
+        self._stop_thread_transact()
+        if self._events is not None:
+            self._events.close()
 
-        self.send_ctrl_cmd(CP210x_PURGE, CP210x_PURGE_ALL, None)
-        self.send_ctrl_cmd(CP210x_IFC_ENABLE, CP210x_UART_DISABLE, None)
+        try:
+            self.send_ctrl_cmd(
+                CP210x_PURGE, CP210x_PURGE_ALL, None, timeout=CLOSE_CTRL_TIMEOUT
+            )
+            self.send_ctrl_cmd(
+                CP210x_IFC_ENABLE, CP210x_UART_DISABLE, None, timeout=CLOSE_CTRL_TIMEOUT
+            )
+        except libusb1.USBError as ue:
+            # e.g. device already gone
+            LOGGER.warning("Error disabling UART on close: %s", ue)
 
         backend = self._device.backend
         dev = self._device._ctx.handle
-        backend.claim_interface(dev, self._intf)
-
-        self._is_open = False
-
+        try:
+            backend.release_interface(dev, self._intf)
+        except libusb1.USBError as ue:
+            LOGGER.warning("Error releasing interface on close: %s", ue)
 
-# ----------------------------------------------------------------------------
+        # wake up blocked readers
+        with self._buf_in.changed:
+            self._buf_in.changed.notify_all()
+        if self._rx_store is not None:
+            self._rx_store.close()
 
+        duration = time.monotonic() - t_start
+        self.close_stats = {"duration": duration, "threads_stopped": stopped}
+        self.last_error = None
+        LOGGER.debug("Port closed in %.1f ms.", duration * 1000)
 
-def main(fd, debug=True):
-    if hasattr(usb.core, "device_from_fd"):
-        device = usb.core.device_from_fd(fd)
-    else:
-        LOGGER.warning("Patch: device_from_fd")
-        device = device_from_fd(fd)
 
-    if debug:
-        shell_usbdevice(fd, device)
+# ----------------------------------------------------------------------------
 
-        print("\n", "#" * 40, "\n")
-        print(device)
 
-    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+def bench(ser, duration=3.0, pings=100, tx=False):
+    """Measure the attached (open) port: control transfer latency, RX
+    throughput of whatever the device sends and, if tx is True, TX
+    throughput to the chip. TX sends duration seconds worth of NUL
+    bytes at the line rate, only use it with a TX->RX loopback or an
+    unconnected TX line. Returns dict, times in seconds."""
+    results = dict()
+
+    # control round trip, uncached
+    rtts = list()
+    for _ in range(pings):
+        t_start = time.perf_counter()
+        ser.get_modem_state(max_age=0)
+        rtts.append(time.perf_counter() - t_start)
+    results["ctrl_rtt"] = {
+        "p50": percentile(rtts, 50),
+        "p99": percentile(rtts, 99),
+        "max": max(rtts),
+    }
 
-    ser = CP210xSerial(device, baudRate=115200)
-    try:
-        # mainly for baud rate
-        ser.open(_async=False)
-        # just poll read forever
-        ser.read_dump_forever()
-    finally:
-        ser.close()
+    # TX until drained (line rate bound, no flow control)
+    if tx:
+        line_rate = ser.baudrate / 10.0
+        tx_size = max(1, int(duration * line_rate))
+        t_start = time.perf_counter()
+        ser.write(bytes(tx_size))
+        ser.flush(2.0 * duration + 1.0)
+        tx_duration = time.perf_counter() - t_start
+        results["tx"] = {
+            "bytes": tx_size,
+            "duration": tx_duration,
+            "throughput": tx_size / tx_duration,
+            "line_rate": line_rate,
+        }
+
+    # RX, data from device (or the TX loopback)
+    ser._buf_in.clear()
+    num = 0
+    t_start = time.perf_counter()
+    while time.perf_counter() - t_start < duration:
+        num += len(ser.read(-1, 0)) or len(ser.read(64 * 1024, 0.1))
+    rx_duration = time.perf_counter() - t_start
+    results["rx"] = {
+        "bytes": num,
+        "duration": rx_duration,
+        "throughput": num / rx_duration,
+        "stats": ser.get_rx_stats(),
+    }
+    return results
+
+
+def port_stats(ser):
+    """Snapshot of port state and statistics as dict."""
+    comm_status = ser.get_comm_status(max_age=0)
+    return {
+        "baudrate": ser.baudrate,
+        "profile": ser.profile,
+        "line_ctl": ser.get_CTL(max_age=0),
+        "modem_state": ser.get_modem_state(max_age=0)[0],
+        "comm_errors": comm_status[0],
+        "tx_queue_device": ser.get_tx_queue_device(),
+        "rx": ser.get_rx_stats(),
+        "ctrl": ser.get_ctrl_stats(),
+        "errors": ser.get_error_stats(),
+    }
 
 
 if __name__ == "__main__":
     # https://wiki.termux.com/wiki/Termux-usb
-    logging.basicConfig(
-        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
-    )
-    logging.getLogger(__name__).setLevel(logging.DEBUG)
-    logging.getLogger("usblib").setLevel(logging.DEBUG)
-    logging.getLogger("{}.RXTX".format(__name__)).setLevel(logging.INFO)
-
-    # grab fd number from args
-    #   (from termux wrapper)
-    import sys
-
-    LOGGER.debug("args: %s", sys.argv)
+    #   termux-usb -r -e "./usblib.py.sh bench" /dev/bus/usb/001/002
+    from usblib_cli import cli
 
-    fd = int(sys.argv[1])
-    main(fd)
+    cli()
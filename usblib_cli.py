@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from usblib import device_from_fd
+from usblib import bench
+from usblib import port_stats
+from usblib import CP210xSerial
+from usblib import PORT_PROFILES
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------------
+
+
+def _open_port(args, _async=True):
+    if args.simulate:
+        from usbtest_loopback import LoopbackDevice
+
+        device = LoopbackDevice(args.baudrate)
+    else:
+        if args.fd is None:
+            raise SystemExit("USB fd required (or --simulate)!")
+        device = device_from_fd(args.fd)
+    assert CP210xSerial.is_usb_cp210x(device), "Unknown CP210x device!"
+
+    ser = CP210xSerial(device, baudRate=args.baudrate, profile=args.profile)
+    ser.open(_async=_async)
+    return ser
+
+
+def _cmd_shell(args):
+    from usbtest_shell import main as shell_main
+
+    shell_main(args.fd)
+
+
+def _cmd_dump(args):
+    ser = _open_port(args, _async=False)
+    try:
+        ser.read_dump_forever(output=args.output, rotate_size=args.rotate_size)
+    finally:
+        ser.close()
+
+
+def _cmd_grab_dso138(args):
+    from dso138mini import grab_data
+
+    ser = _open_port(args)
+    try:
+        data = grab_data(ser, header_timeout=args.header_timeout)
+    finally:
+        ser.close()
+    with open(args.output, "w") as fp:
+        json.dump(data, fp, indent=2)
+    LOGGER.info("Saved %s records to %s", len(data["transfers"]), args.output)
+
+
+def _cmd_loopback_bench(args):
+    from usbtest_loopback import main as loopback_main
+
+    loopback_main(
+        args.fd,
+        simulate=args.simulate,
+        json_file=args.json,
+        duration=args.duration,
+    )
+
+
+def _cmd_stats(args):
+    ser = _open_port(args)
+    try:
+        time.sleep(args.duration)
+        stats = port_stats(ser)
+    finally:
+        ser.close()
+    print(json.dumps(stats, indent=2, default=str))
+
+
+def _cmd_bench(args):
+    ser = _open_port(args)
+    try:
+        res = bench(ser, duration=args.duration, tx=args.tx or args.simulate)
+    finally:
+        ser.close()
+
+    ctrl, tx, rx = res["ctrl_rtt"], res.get("tx"), res["rx"]
+    print(
+        "ctrl rtt:  p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(
+            ctrl["p50"] * 1000, ctrl["p99"] * 1000, ctrl["max"] * 1000
+        )
+    )
+    if tx is not None:
+        print(
+            "tx:        {:.1f} kB/s ({:.0f}% of line rate {:.1f} kB/s)".format(
+                tx["throughput"] / 1024,
+                tx["throughput"] / tx["line_rate"] * 100,
+                tx["line_rate"] / 1024,
+            )
+        )
+    print(
+        "rx:        {:.1f} kB/s, {} bytes in {:.1f} s, {:.0f} transfers/s".format(
+            rx["throughput"] / 1024,
+            rx["bytes"],
+            rx["duration"],
+            rx["stats"]["transfers_per_sec"],
+        )
+    )
+
+
+def cli(argv=None):
+    """Command-line entry point, ``python -m usblib_cli <command> <fd>``.
+    Subcommand modules are imported on use only."""
+    if argv is None:
+        argv = sys.argv[1:]
+    # old style: usblib.py <fd>
+    if len(argv) == 1 and argv[0].isdigit():
+        argv = ["dump"] + list(argv)
+
+    parser = argparse.ArgumentParser(prog="usblib_cli", description="CP210x tools.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug log")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    def command(name, func, help):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument("fd", nargs="?", type=int, help="USB fd (termux)")
+        sub.add_argument("--simulate", action="store_true", help="loopback sim.")
+        sub.add_argument("--baudrate", type=int, default=115200)
+        sub.add_argument("--profile", choices=sorted(PORT_PROFILES))
+        sub.set_defaults(func=func)
+        return sub
+
+    command("shell", _cmd_shell, "USB device info")
+    sub = command("dump", _cmd_dump, "dump raw RX data")
+    sub.add_argument("--output", help="file (default stdout)")
+    sub.add_argument("--rotate-size", type=int)
+    sub = command("grab-dso138", _cmd_grab_dso138, "grab DSO138mini dumps")
+    sub.add_argument("--output", default="dso138mini.grab.json")
+    sub.add_argument("--header-timeout", type=float, default=30.0)
+    sub = command("loopback-bench", _cmd_loopback_bench, "TX->RX self-test")
+    sub.add_argument("--duration", type=float, default=3.0)
+    sub.add_argument("--json", metavar="FILE")
+    sub = command("stats", _cmd_stats, "port state and statistics")
+    sub.add_argument("--duration", type=float, default=1.0)
+    sub = command("bench", _cmd_bench, "throughput/latency of the port")
+    sub.add_argument("--duration", type=float, default=3.0)
+    sub.add_argument("--tx", action="store_true", help="send NUL bytes (loopback only)")
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    level = logging.DEBUG if args.verbose else logging.INFO
+    LOGGER.setLevel(level)
+    logging.getLogger("usblib").setLevel(level)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+    LOGGER.debug("args: %s", args)
+
+    args.func(args)
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    #   termux-usb -r -e "./usblib_cli.py.sh bench" /dev/bus/usb/001/002
+    cli()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+
+import errno
+import logging
+import os
+import select
+import termios
+import threading
+import time
+import tty
+
+from usblib import device_from_fd
+from usblib import percentile
+from usblib import AbstractStoppableThread
+from usblib import CP210xSerial
+from usblib import DATA_BITS_5
+from usblib import DATA_BITS_6
+from usblib import DATA_BITS_7
+from usblib import DATA_BITS_8
+from usblib import FLOW_CONTROL_OFF
+from usblib import PARITY_EVEN
+from usblib import PARITY_MARK
+from usblib import PARITY_NONE
+from usblib import PARITY_ODD
+from usblib import PARITY_SPACE
+from usblib import STOP_BITS_1
+from usblib import STOP_BITS_2
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: max bytes moved per read/write call on the PTY master
+PTY_CHUNK_SIZE = 64 * 1024
+#: interval to check slave line settings (termios) for changes (sec)
+LINE_POLL_INTERVAL = 0.25
+
+#: termios speed constant <-> baud rate
+SPEED_TO_BAUD = {
+    getattr(termios, name): int(name[1:])
+    for name in dir(termios)
+    if name.startswith("B") and name[1:].isdigit()
+}
+BAUD_TO_SPEED = {baud: speed for speed, baud in SPEED_TO_BAUD.items()}
+
+CSIZE_TO_DATA_BITS = {
+    termios.CS5: DATA_BITS_5,
+    termios.CS6: DATA_BITS_6,
+    termios.CS7: DATA_BITS_7,
+    termios.CS8: DATA_BITS_8,
+}
+# mark/space parity, Linux only
+CMSPAR = getattr(termios, "CMSPAR", 0)
+
+# ----------------------------------------------------------------------------
+
+
+class PtyBridge(AbstractStoppableThread):
+    """Expose an open :class:`CP210xSerial` as pseudo-terminal, so
+    standard tools (minicom, screen, pyserial) can use it, see
+    :attr:`slave_name`.
+
+    Single select loop: PTY master input is queued into the TX buffer
+    with :meth:`CP210xSerial.write`, the RX buffer is drained into the
+    PTY master in chunks. The RX thread only signals new data through a
+    wake-up pipe (RX sink). Line settings made on the slave side (baud
+    rate, data bits, parity, stop bits, B0 hang up) are polled and
+    applied to the chip, unsupported ones (RTS/CTS) are logged."""
+
+    def __init__(self, serial, *args, **kwargs):
+        super(PtyBridge, self).__init__(serial, *args, **kwargs)
+        self.master, self._slave = os.openpty()
+        self.slave_name = os.ttyname(self._slave)
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._wake_pending = False
+        # RX data read from buffer, not yet accepted by PTY
+        self._pending = b""
+
+        self._line_attrs = None
+        self._t_line_check = 0
+
+        self.num_rx = 0
+        self.num_tx = 0
+
+        self._init_line_settings()
+
+    def _init_line_settings(self):
+        # show current port settings to the slave side
+        attrs = termios.tcgetattr(self._slave)
+        speed = BAUD_TO_SPEED.get(self.serial.baudrate)
+        if speed is not None:
+            attrs[4] = attrs[5] = speed
+        termios.tcsetattr(self._slave, termios.TCSANOW, attrs)
+        self._line_attrs = termios.tcgetattr(self._slave)
+
+    # called by RX thread, after data was added to the RX buffer
+    def write(self, data, timestamp):
+        self._wake()
+
+    def _wake(self):
+        if self._wake_pending:
+            return
+        self._wake_pending = True
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+
+    def start(self):
+        self.serial.add_rx_sink(self)
+        super(PtyBridge, self).start()
+        # data received before start
+        self._wake()
+
+    def stop(self):
+        super(PtyBridge, self).stop()
+        self._wake()
+
+    def runOne(self):
+        buf = self.serial._buf_in
+        rlist = [self.master, self._wake_r]
+        wlist = [self.master] if self._pending else []
+        try:
+            readable, writable, _ = select.select(rlist, wlist, [], LINE_POLL_INTERVAL)
+        except InterruptedError:
+            return
+
+        if self._wake_r in readable:
+            # clear flag first, no wake-up lost
+            self._wake_pending = False
+            try:
+                os.read(self._wake_r, 4096)
+            except BlockingIOError:
+                pass
+
+        # TX: PTY -> TX buffer, blocks if TX buffer full (backpressure)
+        if self.master in readable:
+            try:
+                data = os.read(self.master, PTY_CHUNK_SIZE)
+            except OSError as ex:
+                if ex.errno != errno.EIO:
+                    raise
+                data = b""
+            if data:
+                self.num_tx += self.serial.write(data)
+
+        # RX: RX buffer -> PTY, keep rest if PTY full
+        while True:
+            if not self._pending:
+                self._pending = buf.read(PTY_CHUNK_SIZE)
+                if not self._pending:
+                    break
+            try:
+                num = os.write(self.master, self._pending)
+            except BlockingIOError:
+                break
+            self.num_rx += num
+            self._pending = self._pending[num:]
+            if self._pending:
+                break
+
+        now = time.monotonic()
+        if now - self._t_line_check >= LINE_POLL_INTERVAL:
+            self._t_line_check = now
+            self._check_line_settings()
+
+    def _check_line_settings(self):
+        attrs = termios.tcgetattr(self._slave)
+        old, self._line_attrs = self._line_attrs, attrs
+        if old is not None and attrs[2] == old[2] and attrs[4:6] == old[4:6]:
+            return
+
+        ser = self.serial
+        cflag, speed = attrs[2], attrs[5]
+        LOGGER.debug("Slave line settings changed, cflag=%#x", cflag)
+
+        baudRate = SPEED_TO_BAUD.get(speed)
+        if baudRate == 0:
+            # B0, hang up
+            self._apply("DTR", ser.set_DTR, False)
+        elif baudRate:
+            if old is not None and SPEED_TO_BAUD.get(old[5]) == 0:
+                # speed set again after hang up
+                self._apply("DTR", ser.set_DTR, True)
+            if baudRate != ser.baudrate:
+                self._apply("baud rate", ser.set_baudRate, baudRate)
+
+        self._apply(
+            "data bits",
+            ser.set_dataBits,
+            CSIZE_TO_DATA_BITS.get(cflag & termios.CSIZE, DATA_BITS_8),
+        )
+        self._apply(
+            "stop bits",
+            ser.set_stopBits,
+            STOP_BITS_2 if cflag & termios.CSTOPB else STOP_BITS_1,
+        )
+
+        if not cflag & termios.PARENB:
+            parity = PARITY_NONE
+        elif cflag & CMSPAR:
+            parity = PARITY_MARK if cflag & termios.PARODD else PARITY_SPACE
+        else:
+            parity = PARITY_ODD if cflag & termios.PARODD else PARITY_EVEN
+        self._apply("parity", ser.set_parity, parity)
+
+        if cflag & termios.CRTSCTS:
+            # not supported by CP210xSerial (yet), keep bridge running
+            if old is None or not old[2] & termios.CRTSCTS:
+                LOGGER.warning("RTS/CTS flow control not supported, ignored.")
+        else:
+            self._apply("flow control", ser.set_flowControl, FLOW_CONTROL_OFF)
+
+    def _apply(self, name, setter, value):
+        # one failing setting must not stop the bridge
+        try:
+            setter(value)
+        except Exception as ex:
+            LOGGER.warning("Cannot set %s to %s: %r", name, value, ex)
+
+    def run(self):
+        try:
+            super(PtyBridge, self).run()
+        finally:
+            self.serial.remove_rx_sink(self)
+
+    def close(self):
+        self.stop()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+        for fd in (self.master, self._slave, self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+# ----------------------------------------------------------------------------
+
+
+def _open_slave(bridge):
+    fd = os.open(bridge.slave_name, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    # keep port settings, setraw does not touch speed
+    return fd
+
+
+def _read_exact(fd, size, timeout):
+    data = bytearray()
+    t_end = time.monotonic() + timeout
+    while len(data) < size:
+        delay = t_end - time.monotonic()
+        if delay <= 0 or not select.select([fd], [], [], delay)[0]:
+            break
+        data += os.read(fd, size - len(data))
+    return bytes(data)
+
+
+def benchmark(ser, pings=200, size=256 * 1024):
+    """Compare round-trip latency and throughput of the library API and
+    the PTY bridge, needs TX->RX loopback. Returns dict of results."""
+    from usbtest_loopback import make_frame
+    from usbtest_loopback import FRAME_SIZE
+
+    def latency(write, read):
+        rtts = list()
+        for seq in range(pings):
+            frame = make_frame(seq)
+            t_start = time.perf_counter()
+            write(frame)
+            data = read(FRAME_SIZE)
+            if bytes(data) == frame:
+                rtts.append(time.perf_counter() - t_start)
+        return {
+            "lost": pings - len(rtts),
+            "rtt_p50": percentile(rtts, 50),
+            "rtt_p99": percentile(rtts, 99),
+        }
+
+    def throughput(write, read):
+        payload = os.urandom(size)
+        received = bytearray()
+
+        def reader():
+            while len(received) < size:
+                data = read(min(PTY_CHUNK_SIZE, size - len(received)))
+                if not data:
+                    break
+                received.extend(data)
+
+        thrd = threading.Thread(target=reader)
+        t_start = time.perf_counter()
+        thrd.start()
+        view = memoryview(payload)
+        for pos in range(0, size, 4096):
+            write(view[pos : pos + 4096])
+        thrd.join()
+        duration = time.perf_counter() - t_start
+        return {
+            "throughput": len(received) / duration,
+            "corrupt": bytes(received) != payload,
+        }
+
+    results = dict()
+
+    # direct API
+    ser._buf_in.clear()
+    results["api"] = latency(ser.write, lambda n: ser.read(n, 1.0))
+    results["api"].update(throughput(ser.write, lambda n: ser.read(n, 1.0)))
+
+    # through PTY
+    bridge = PtyBridge(ser)
+    bridge.start()
+    fd = _open_slave(bridge)
+    try:
+        results["pty"] = latency(
+            lambda d: os.write(fd, d), lambda n: _read_exact(fd, n, 1.0)
+        )
+
+        def pty_write(data):
+            while data:
+                data = data[os.write(fd, data) :]
+
+        results["pty"].update(throughput(pty_write, lambda n: _read_exact(fd, n, 1.0)))
+    finally:
+        os.close(fd)
+        bridge.close()
+    return results
+
+
+# ----------------------------------------------------------------------------
+
+
+def main(fd, simulate=False, run_benchmark=False, baudRate=115200):
+    if simulate:
+        from usbtest_loopback import LoopbackDevice
+
+        device = LoopbackDevice(baudRate)
+    else:
+        device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    ser = CP210xSerial(device, baudRate=baudRate)
+    try:
+        ser.open(_async=True)
+        if run_benchmark:
+            results = benchmark(ser)
+            for name in ("api", "pty"):
+                res = results[name]
+                LOGGER.info(
+                    "%s: rtt p50 %.2f ms, p99 %.2f ms, lost %s, %.1f kB/s%s",
+                    name,
+                    (res["rtt_p50"] or 0) * 1000,
+                    (res["rtt_p99"] or 0) * 1000,
+                    res["lost"],
+                    res["throughput"] / 1024,
+                    ", CORRUPT" if res["corrupt"] else "",
+                )
+            return results
+
+        with PtyBridge(ser) as bridge:
+            bridge.start()
+            LOGGER.info("PTY: %s, stop with Ctrl+C ...", bridge.slave_name)
+            print(bridge.slave_name, flush=True)
+            while ser.is_open:
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ser.close()
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.INFO)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Expose port as pseudo-terminal.")
+    parser.add_argument("fd", nargs="?", type=int, help="USB fd (termux)")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--simulate", action="store_true", help="simulated loopback")
+    parser.add_argument(
+        "--benchmark", action="store_true", help="compare with API (needs loopback)"
+    )
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    main(
+        args.fd,
+        simulate=args.simulate,
+        run_benchmark=args.benchmark,
+        baudRate=args.baudrate,
+    )
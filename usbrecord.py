@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+import logging
+import struct
+import threading
+import time
+
+from usblib import device_from_fd
+from usblib import AbstractStoppableThread
+from usblib import CP210xSerial
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: file magic, raw RX stream recording
+RECORDING_MAGIC = b"USBREC1\n"
+#: per packet header: monotonic timestamp (sec), length
+RECORD_HEADER = struct.Struct("<dI")
+
+#: max bytes queued in RX buffer when replaying as fast as possible
+REPLAY_MAX_PENDING = 1024 * 1024
+
+# ----------------------------------------------------------------------------
+
+
+class StreamRecorder:
+    """Raw RX stream recorder, register with
+    :meth:`CP210xSerial.add_rx_sink`.
+
+    Each received transfer is stored with its arrival time, so the
+    stream can be replayed with the original timing."""
+
+    def __init__(self, fp, buffer_size=64 * 1024):
+        if isinstance(fp, str):
+            fp = open(fp, "wb", buffering=buffer_size)
+            self._own_fp = True
+        else:
+            self._own_fp = False
+        self.fp = fp
+        self.lock = threading.Lock()
+        self.num_packets = 0
+        self.num_bytes = 0
+
+        self.fp.write(RECORDING_MAGIC)
+
+    def write(self, data, timestamp):
+        with self.lock:
+            self.fp.write(RECORD_HEADER.pack(timestamp, len(data)))
+            self.fp.write(data)
+            self.num_packets += 1
+            self.num_bytes += len(data)
+
+    def close(self):
+        with self.lock:
+            if self._own_fp:
+                self.fp.close()
+            else:
+                self.fp.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+def iter_recording(fp):
+    """Iterate over ``(timestamp, data)`` tuples of a recording."""
+    if isinstance(fp, str):
+        with open(fp, "rb") as fp:
+            yield from iter_recording(fp)
+        return
+
+    magic = fp.read(len(RECORDING_MAGIC))
+    if magic != RECORDING_MAGIC:
+        raise ValueError("Not a raw stream recording!")
+
+    while True:
+        header = fp.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            break
+        timestamp, size = RECORD_HEADER.unpack(header)
+        data = fp.read(size)
+        if len(data) < size:
+            LOGGER.warning("Truncated recording, packet incomplete.")
+            break
+        yield timestamp, data
+
+
+# ----------------------------------------------------------------------------
+
+
+class ReplayThread(AbstractStoppableThread):
+    def __init__(self, serial, packets, speed=1.0, *args, **kwargs):
+        super(ReplayThread, self).__init__(serial, *args, **kwargs)
+        self.packets = packets
+        self.speed = speed
+        self._t0_rec = None
+        self._t0 = None
+
+    def runOne(self):
+        ser = self.serial
+        buf = ser._buf_in
+
+        try:
+            timestamp, data = next(self.packets)
+        except StopIteration:
+            ser._replay_finished()
+            return
+
+        if self.speed:
+            # keep original packet timing, scaled, recorded time shifted
+            # to replay start is the arrival time for buffer and sinks
+            if self._t0 is None:
+                self._t0_rec, self._t0 = timestamp, time.monotonic()
+            arrival = self._t0 + (timestamp - self._t0_rec) / self.speed
+            delay = arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # as fast as possible, but do not fill memory, no original
+            # timing so packets arrive now
+            with buf.changed:
+                while len(buf) > REPLAY_MAX_PENDING and not self.should_stop:
+                    buf.changed.wait(0.1)
+            arrival = time.monotonic()
+
+        buf.write(data, arrival)
+        for sink in ser._rx_sinks:
+            sink.write(data, arrival)
+
+
+class ReplaySerial(CP210xSerial):
+    """Replay a raw stream recording through the :class:`CP210xSerial`
+    read API (``read``, ``read_until``, ...), without any USB device.
+
+    speed is the replay speed factor, 1.0 is real time, 0 or None is as
+    fast as possible. After the last packet the port is closed, buffered
+    data can still be read."""
+
+    def __init__(self, source, speed=1.0, baudRate=115200):
+        super(ReplaySerial, self).__init__(None, baudRate=baudRate)
+        self._source = source
+        self._speed = speed
+        self._thrd_replay = None
+        self.replay_done = threading.Event()
+
+    @staticmethod
+    def is_usb_cp210x(device):
+        return True
+
+    def set_baudRate(self, baudRate):
+        self._baudRate = baudRate
+        return 0
+
+    def open(self, _async=True):
+        if self._is_open:
+            return
+
+        self._is_open = True
+        self._is_async = True
+        if self._rx_store is not None:
+            self._rx_store.closed = False
+        self.replay_done.clear()
+        self._thrd_replay = ReplayThread(
+            self, iter_recording(self._source), speed=self._speed
+        )
+        self._thrd_replay.start()
+
+    def _replay_finished(self):
+        self._is_open = False
+        self.replay_done.set()
+        # wake up waiting readers
+        with self._buf_in.changed:
+            self._buf_in.changed.notify_all()
+        if self._rx_store is not None:
+            self._rx_store.close()
+
+    def close(self):
+        self._is_open = False
+        if self._thrd_replay:
+            self._thrd_replay.stop()
+            if self._thrd_replay is not threading.current_thread():
+                self._thrd_replay.join()
+            self._thrd_replay = None
+
+
+# ----------------------------------------------------------------------------
+
+
+def record(fd, filename):
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    ser = CP210xSerial(device, baudRate=115200)
+    with StreamRecorder(filename) as rec:
+        ser.add_rx_sink(rec)
+        try:
+            ser.open(_async=True)
+            LOGGER.info("Recording to %s, stop with Ctrl+C ...", filename)
+            while True:
+                time.sleep(1.0)
+                # consume, keep buffer small
+                ser._buf_in.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ser.close()
+            ser.remove_rx_sink(rec)
+        LOGGER.info("Recorded %s packets, %s bytes.", rec.num_packets, rec.num_bytes)
+
+
+def replay_benchmark(filename, speed=None, header_timeout=0):
+    """Replay recording through :func:`dso138mini.grab_data` and report
+    consumer throughput.
+
+    Note that with a fast replay the header read (header_timeout) may
+    consume dump data, so record after the DSO138 header or use 0."""
+    from dso138mini import grab_data
+
+    ser = ReplaySerial(filename, speed=speed)
+    try:
+        ser.open()
+        t_start = time.monotonic()
+        data = grab_data(ser, header_timeout=header_timeout)
+        duration = time.monotonic() - t_start
+    finally:
+        ser.close()
+
+    num_bytes = sum(len(d) for _, d in iter_recording(filename))
+    LOGGER.info(
+        "Replayed %s bytes in %.3f sec (%.1f kB/s), %s transfers parsed.",
+        num_bytes,
+        duration,
+        num_bytes / max(duration, 1e-9) / 1024,
+        len(data["transfers"]),
+    )
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.DEBUG)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record or replay RX stream.")
+    parser.add_argument("fd", nargs="?", type=int, help="USB fd (termux) to record")
+    parser.add_argument("filename", nargs="?", default="usbrecord.rec")
+    parser.add_argument("--replay", metavar="FILE", help="replay FILE (benchmark)")
+    parser.add_argument(
+        "--speed", type=float, default=0, help="replay speed, 0 as fast as possible"
+    )
+    parser.add_argument(
+        "--header-timeout", type=float, default=0, help="DSO138 header wait (sec)"
+    )
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    if args.replay:
+        replay_benchmark(
+            args.replay, speed=args.speed, header_timeout=args.header_timeout
+        )
+    else:
+        record(args.fd, args.filename)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+import logging
+import mmap
+import os
+import platform
+import struct
+import sys
+import time
+
+from usblib import device_from_fd
+from usblib import CP210xSerial
+from usblib import Timeout
+from usblib import MAX_TRANSFER_SIZE
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+RING_MAGIC = b"USBRING1"
+#: header: magic, capacity, sequence (odd while updating), head, tail
+#: (total byte counters, not wrapped), wall time first/last write, closed
+RING_HEADER = struct.Struct("<8sQQQQddQ")
+#: offset of sequence counter in header
+RING_OFF_SEQ = 16
+#: header part after the sequence counter: head, tail, times, closed
+RING_STATE = struct.Struct("<QQddQ")
+RING_OFF_STATE = 24
+#: data starts after header, padded
+RING_DATA_OFFSET = 64
+
+DEFAULT_RING_SIZE = 16 * 1024 * 1024
+#: poll interval for readers tailing the ring (sec)
+POLL_INTERVAL = 10 / 1000.0
+
+# ----------------------------------------------------------------------------
+
+
+def is_strongly_ordered():
+    """True on x86 CPUs (TSO), where other processes see the stores of
+    the ring sink in program order, see :class:`MmapRingReader`."""
+    return platform.machine().lower() in ("x86_64", "amd64", "i386", "i686")
+
+
+class MmapRingSink:
+    """Crash-safe RX sink, memory-mapped file used as byte ring.
+
+    Register with :meth:`CP210xSerial.add_rx_sink`, the RX thread copies
+    each transfer into the mapping, no write syscall per packet. The
+    kernel writes the dirty pages back, so data survives a killed
+    process; sync_interval (sec) additionally msyncs from time to time
+    (power loss). The oldest data is overwritten once the ring is full.
+
+    An existing ring file of the same size is resumed (data kept),
+    open it concurrently or after a restart with :class:`MmapRingReader`.
+    """
+
+    def __init__(self, filename, size=DEFAULT_RING_SIZE, sync_interval=None):
+        self.filename = filename
+        self.sync_interval = sync_interval
+        total = RING_DATA_OFFSET + size
+
+        resume = os.path.exists(filename) and os.path.getsize(filename) == total
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        if not resume:
+            os.ftruncate(self._fd, total)
+        self.map = mmap.mmap(self._fd, total, access=mmap.ACCESS_WRITE)
+        self.data = memoryview(self.map)[RING_DATA_OFFSET:]
+        self.capacity = size
+
+        header = RING_HEADER.unpack_from(self.map, 0)
+        if resume and header[0] == RING_MAGIC and header[1] == size:
+            _, _, seq, head, tail, t_first, t_last, _ = header
+            if seq & 1:
+                # killed while updating, head may be the old one but the
+                #   oldest data may be partially overwritten
+                seq += 1
+                tail = max(tail, head + MAX_TRANSFER_SIZE - size)
+            self._seq = seq
+            LOGGER.info("Resuming ring %s at %s bytes.", filename, head)
+        else:
+            self._seq, head, tail, t_first, t_last = 0, 0, 0, 0.0, 0.0
+        self.head, self.tail = head, tail
+        self.t_first, self.t_last = t_first, t_last
+        self._wall_offset = time.time() - time.monotonic()
+        self._last_sync = time.monotonic()
+        struct.pack_into("<8sQ", self.map, 0, RING_MAGIC, self.capacity)
+        self._begin()
+        self._publish(closed=False)
+
+    def _begin(self):
+        # seqlock, odd while updating, readers retry
+        self._seq += 1
+        struct.pack_into("<Q", self.map, RING_OFF_SEQ, self._seq)
+
+    def _publish(self, closed=False):
+        # state first, then the new even sequence in a separate write,
+        #   a reader never sees an even sequence with old head/tail
+        RING_STATE.pack_into(
+            self.map,
+            RING_OFF_STATE,
+            self.head,
+            self.tail,
+            self.t_first,
+            self.t_last,
+            int(closed),
+        )
+        self._seq += 1
+        struct.pack_into("<Q", self.map, RING_OFF_SEQ, self._seq)
+
+    # called by RX thread
+    def write(self, data, timestamp=None):
+        size = len(data)
+        if not size:
+            return 0
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if size > self.capacity:
+            # only the newest part fits
+            data = memoryview(data)[size - self.capacity :]
+
+        self._begin()
+
+        pos = (self.head + size - len(data)) % self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.data[pos : pos + first] = data[:first]
+        if first < len(data):
+            self.data[: len(data) - first] = data[first:]
+
+        self.head += size
+        self.tail = max(self.tail, self.head - self.capacity)
+        self.t_last = timestamp + self._wall_offset
+        if not self.t_first:
+            self.t_first = self.t_last
+        self._publish()
+
+        if self.sync_interval is not None:
+            now = time.monotonic()
+            if now - self._last_sync >= self.sync_interval:
+                self._last_sync = now
+                self.map.flush()
+        return size
+
+    def close(self):
+        if self.map is None:
+            return
+        self._begin()
+        self._publish(closed=True)
+        self.data.release()
+        self.map.flush()
+        self.map.close()
+        os.close(self._fd)
+        self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+class MmapRingReader:
+    """Read-only view of a :class:`MmapRingSink` file, from another
+    process or after a restart.
+
+    :meth:`recover` returns all retained data, :meth:`read` tails the
+    stream (polling every :data:`POLL_INTERVAL`), bytes overwritten
+    before they could be read are counted in ``lost``.
+
+    Tailing a live ring relies on the sink's stores (data, state,
+    sequence) becoming visible in program order, which holds on x86
+    (TSO) only. Python has no memory barriers, on weakly ordered CPUs
+    (ARM) a live reader may see an even sequence before the data or
+    state, :func:`tail` warns there. Recovery of a ring written by a
+    finished or killed process is not affected."""
+
+    def __init__(self, filename, from_start=False):
+        self._fp = open(filename, "rb")
+        self.map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, capacity = RING_HEADER.unpack_from(self.map, 0)[:2]
+        if magic != RING_MAGIC:
+            raise ValueError("Not a ring file!")
+        self.capacity = capacity
+        self.lost = 0
+        header = self.header()
+        self.pos = header["tail"] if from_start else header["head"]
+
+    def _seq(self):
+        return struct.unpack_from("<Q", self.map, RING_OFF_SEQ)[0]
+
+    def header(self):
+        """Consistent header snapshot as dict."""
+        while True:
+            seq = self._seq()
+            fields = RING_STATE.unpack_from(self.map, RING_OFF_STATE)
+            # unchanged while reading state
+            if not seq & 1 and seq == self._seq():
+                break
+            time.sleep(0)
+        head, tail, t_first, t_last, closed = fields
+        return {
+            "seq": seq,
+            "head": head,
+            "tail": tail,
+            "t_first": t_first,
+            "t_last": t_last,
+            "closed": bool(closed),
+        }
+
+    def _copy(self, start, stop):
+        # copy [start, stop) out of ring, None if overwritten meanwhile
+        capacity = self.capacity
+        pos = start % capacity
+        size = stop - start
+        first = min(size, capacity - pos)
+        offset = RING_DATA_OFFSET + pos
+        data = self.map[offset : offset + first]
+        if first < size:
+            data += self.map[RING_DATA_OFFSET : RING_DATA_OFFSET + size - first]
+        # writer may have wrapped over our range while copying
+        if self.header()["head"] - capacity > start:
+            return None
+        return data
+
+    def recover(self):
+        """Return ``(data, header)`` with all retained data."""
+        while True:
+            header = self.header()
+            data = self._copy(header["tail"], header["head"])
+            if data is not None:
+                return data, header
+
+    @property
+    def is_open(self):
+        return not self.header()["closed"]
+
+    def read(self, size=-1, timeout=None):
+        """Read new data since last read, at most size bytes, wait at
+        most timeout seconds for data (None forever, 0 non-blocking)."""
+        with Timeout(timeout) as to:
+            while True:
+                header = self.header()
+                if header["tail"] > self.pos:
+                    self.lost += header["tail"] - self.pos
+                    self.pos = header["tail"]
+                avail = header["head"] - self.pos
+                if avail > 0 or to.expired() or header["closed"]:
+                    break
+                time.sleep(POLL_INTERVAL)
+
+        if avail <= 0:
+            return b""
+        if size and 0 < size < avail:
+            avail = size
+        data = self._copy(self.pos, self.pos + avail)
+        if data is None:
+            # overwritten, retry from new tail
+            return self.read(size, 0)
+        self.pos += avail
+        return data
+
+    def close(self):
+        self.map.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+# ----------------------------------------------------------------------------
+
+
+def record(fd, filename, size=DEFAULT_RING_SIZE):
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    ser = CP210xSerial(device, baudRate=115200)
+    with MmapRingSink(filename, size) as ring:
+        ser.add_rx_sink(ring)
+        try:
+            ser.open(_async=True)
+            LOGGER.info("Recording to ring %s, stop with Ctrl+C ...", filename)
+            while True:
+                time.sleep(1.0)
+                # consume, keep buffer small
+                ser._buf_in.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ser.close()
+            ser.remove_rx_sink(ring)
+
+
+def tail(filename, from_start=False):
+    if not is_strongly_ordered():
+        LOGGER.warning(
+            "Live tail on %s is not reliable, stores may be seen out of order"
+            " (x86 only).",
+            platform.machine(),
+        )
+    with MmapRingReader(filename, from_start=from_start) as reader:
+        try:
+            while True:
+                data = reader.read(timeout=1.0)
+                if data:
+                    sys.stdout.buffer.write(data)
+                    sys.stdout.buffer.flush()
+                elif not reader.is_open:
+                    break
+        except KeyboardInterrupt:
+            pass
+        if reader.lost:
+            LOGGER.warning("Lost %s bytes (overwritten).", reader.lost)
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Memory-mapped RX ring.")
+    parser.add_argument("fd", nargs="?", type=int, help="USB fd (termux) to record")
+    parser.add_argument("filename", nargs="?", default="usbring.ring")
+    parser.add_argument("--size", type=int, default=DEFAULT_RING_SIZE)
+    parser.add_argument("--recover", metavar="FILE", help="write retained data")
+    parser.add_argument("--tail", metavar="FILE", help="follow stream")
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    if args.recover:
+        with MmapRingReader(args.recover) as reader:
+            data, header = reader.recover()
+            LOGGER.info("Recovered %s bytes, header: %s", len(data), header)
+            sys.stdout.buffer.write(data)
+    elif args.tail:
+        tail(args.tail, from_start=True)
+    else:
+        record(args.fd, args.filename, args.size)
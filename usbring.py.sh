@@ -0,0 +1 @@
+_usbtest.sh
\ No newline at end of file
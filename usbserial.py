@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+
+import logging
+import time
+
+import serial
+from serial.serialutil import SerialBase
+from serial.serialutil import SerialException
+from serial.serialutil import PortNotOpenError
+
+from usblib import device_from_fd
+from usblib import CP210xSerial
+from usblib import Timeout
+from usblib import DEFAULT_TX_BUFFER_SIZE
+from usblib import FLOW_CONTROL_OFF
+from usblib import MODEM_CTS
+from usblib import MODEM_DCD
+from usblib import MODEM_DSR
+from usblib import MODEM_RI
+from usblib import PARITY_EVEN
+from usblib import PARITY_MARK
+from usblib import PARITY_NONE
+from usblib import PARITY_ODD
+from usblib import PARITY_SPACE
+from usblib import STOP_BITS_1
+from usblib import STOP_BITS_15
+from usblib import STOP_BITS_2
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: pyserial -> CP210x line settings
+PARITY_MAP = {
+    serial.PARITY_NONE: PARITY_NONE,
+    serial.PARITY_ODD: PARITY_ODD,
+    serial.PARITY_EVEN: PARITY_EVEN,
+    serial.PARITY_MARK: PARITY_MARK,
+    serial.PARITY_SPACE: PARITY_SPACE,
+}
+STOPBITS_MAP = {
+    serial.STOPBITS_ONE: STOP_BITS_1,
+    serial.STOPBITS_ONE_POINT_FIVE: STOP_BITS_15,
+    serial.STOPBITS_TWO: STOP_BITS_2,
+}
+
+# ----------------------------------------------------------------------------
+
+
+class CP210xPySerial(SerialBase):
+    """pyserial compatible :class:`serial.SerialBase` over
+    :class:`CP210xSerial`, so code written against pyserial can use the
+    Termux fd wrapped device.
+
+    device is a pyusb device or the USB fd (termux), port is only used
+    as name. Reads wait on the RX buffer condition (no polling),
+    ``readinto`` copies once from the RX buffer, ``read_until`` and
+    ``readline`` search the buffer instead of reading byte by byte.
+
+    Further CP210xSerial arguments (profile, tx_buffer_size, ...) can be
+    given with serial_kwargs, the driver is available as :attr:`driver`.
+    """
+
+    def __init__(self, device=None, *args, **kwargs):
+        if isinstance(device, int):
+            device = device_from_fd(device)
+        self._device = device
+        self.driver = None
+        self._serial_kwargs = kwargs.pop("serial_kwargs", None) or dict()
+        self._serial_kwargs.setdefault("tx_buffer_size", DEFAULT_TX_BUFFER_SIZE)
+        self._cancel_read = False
+        if device is not None and kwargs.get("port") is None:
+            kwargs["port"] = "usb:{}:{}".format(
+                getattr(device, "bus", "-"), getattr(device, "address", "-")
+            )
+        super(CP210xPySerial, self).__init__(*args, **kwargs)
+
+    # --------------------------------
+
+    def open(self):
+        if self._device is None:
+            raise SerialException("No USB device given.")
+        if self.is_open:
+            raise SerialException("Port is already open.")
+
+        self.driver = CP210xSerial(
+            self._device, baudRate=self._baudrate, **self._serial_kwargs
+        )
+        self.driver.open(_async=True)
+        self.is_open = True
+        try:
+            self._reconfigure_port()
+            if not self._dsrdtr:
+                self._update_dtr_state()
+            if not self._rtscts:
+                self._update_rts_state()
+        except Exception:
+            self.close()
+            raise
+        self.reset_input_buffer()
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.driver.close()
+
+    def _reconfigure_port(self):
+        if not self.is_open:
+            return
+        drv = self.driver
+        if drv.baudrate != self._baudrate:
+            drv.set_baudRate(self._baudrate)
+        drv.set_dataBits(self._bytesize)
+        drv.set_parity(PARITY_MAP[self._parity])
+        drv.set_stopBits(STOPBITS_MAP[self._stopbits])
+
+        if self._rtscts or self._dsrdtr or self._xonxoff:
+            # only FLOW_CONTROL_OFF is implemented by CP210xSerial
+            raise SerialException("Only flow control off is supported.")
+        drv.set_flowControl(FLOW_CONTROL_OFF)
+
+    # --------------------------------
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return len(self.driver._buf_in)
+
+    @property
+    def out_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return self.driver._tx_queued()
+
+    def _wait(self, buf, done):
+        """Wait on RX buffer (lock held) until done() or timeout, with
+        pyserial timeout and inter_byte_timeout semantics (idle time
+        from RX arrival times, see :meth:`CP210xSerial._wait_rx`)."""
+        self._cancel_read = False
+        drv = self.driver
+        with Timeout(self._timeout) as to:
+            drv._wait_rx(
+                lambda: done() or self._cancel_read or not drv.is_open,
+                to,
+                self._inter_byte_timeout,
+            )
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        if size <= 0:
+            return b""
+        buf = self.driver._buf_in
+        with buf.changed:
+            self._wait(buf, lambda: len(buf) >= size)
+            return bytes(buf.read(min(size, len(buf))))
+
+    def readinto(self, b):
+        if not self.is_open:
+            raise PortNotOpenError()
+        size = memoryview(b).nbytes
+        buf = self.driver._buf_in
+        with buf.changed:
+            self._wait(buf, lambda: len(buf) >= size)
+            return buf.readinto(b)
+
+    def read_until(self, expected=serial.LF, size=None):
+        if not self.is_open:
+            raise PortNotOpenError()
+        buf = self.driver._buf_in
+        # search only new data
+        pos = [0]
+
+        def found():
+            idx = buf.buf.find(expected, pos[0])
+            if idx != -1:
+                return True
+            pos[0] = max(0, len(buf) - len(expected) + 1)
+            return size is not None and len(buf) >= size
+
+        with buf.changed:
+            self._wait(buf, found)
+            return bytes(buf.read_until(expected, size or -1))
+
+    def readline(self, size=-1):
+        return self.read_until(serial.LF, size if size and size > 0 else None)
+
+    def cancel_read(self):
+        self._cancel_read = True
+        if not self.is_open:
+            return
+        buf = self.driver._buf_in
+        with buf.changed:
+            buf.changed.notify_all()
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        num = self.driver.write(data, timeout=self._write_timeout)
+        if self._write_timeout is not None and num < len(data):
+            raise serial.SerialTimeoutException("Write timeout")
+        return num
+
+    def flush(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.flush(self._write_timeout)
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.purgeHWBuffer(True, False)
+        self.driver._buf_in.clear()
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.clear_tx()
+        self.driver.purgeHWBuffer(False, True)
+
+    # --------------------------------
+
+    def _update_break_state(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.set_break(self._break_state)
+
+    def _update_rts_state(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.set_RTS(self._rts_state)
+
+    def _update_dtr_state(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.driver.set_DTR(self._dtr_state)
+
+    def _modem_bit(self, mask):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return bool(self.driver.get_modem_state()[0] & mask)
+
+    @property
+    def cts(self):
+        return self._modem_bit(MODEM_CTS)
+
+    @property
+    def dsr(self):
+        return self._modem_bit(MODEM_DSR)
+
+    @property
+    def ri(self):
+        return self._modem_bit(MODEM_RI)
+
+    @property
+    def cd(self):
+        return self._modem_bit(MODEM_DCD)
+
+
+# ----------------------------------------------------------------------------
+
+
+def benchmark(device, lines=2000, baudRate=921600):
+    """Read loopback lines with :meth:`CP210xSerial.read_until` and
+    with the pyserial facade ``readline``, log lines/s of both."""
+    payload = b"".join(b"%06d some line payload\n" % i for i in range(lines))
+
+    def run(name, write, readline):
+        t_start = time.perf_counter()
+        write(payload)
+        num = 0
+        while num < lines and readline():
+            num += 1
+        duration = time.perf_counter() - t_start
+        LOGGER.info("%-10s %s lines in %.3f sec", name, num, duration)
+        return duration
+
+    ser = CP210xPySerial(device, baudrate=baudRate, timeout=1.0)
+    try:
+        drv = ser.driver
+        results = {
+            "usblib": run(
+                "usblib", drv.write, lambda: drv.read_until(b"\n", timeout=1.0)
+            ),
+            "pyserial": run("pyserial", ser.write, ser.readline),
+        }
+    finally:
+        ser.close()
+    return results
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.INFO)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="pyserial facade benchmark.")
+    parser.add_argument("fd", nargs="?", type=int, help="USB fd (termux)")
+    parser.add_argument("--simulate", action="store_true", help="simulated loopback")
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    if args.simulate:
+        from usbtest_loopback import LoopbackDevice
+
+        device = LoopbackDevice()
+    else:
+        device = args.fd
+    benchmark(device)
@@ -0,0 +1,533 @@
+#!/usr/bin/env python
+
+import logging
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from usblib import device_from_fd
+from usblib import percentile
+from usblib import Buffer
+from usblib import CP210xSerial
+from usblib import Timeout
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# header: capacity, head (total bytes written), closed, max readers, dropped,
+#   writer waiting for space
+RING_HEADER = struct.Struct("<QQQQQQ")
+# per reader slot: tail (total bytes read), active, waiting for data
+RING_READER = struct.Struct("<QQQ")
+
+RING_OFF_HEAD = 8
+RING_OFF_CLOSED = 16
+RING_OFF_DROPPED = 32
+RING_OFF_WRITER_WAITING = 40
+RING_OFF_READER_ACTIVE = 8
+RING_OFF_READER_WAITING = 16
+
+#: default ring size
+DEFAULT_RING_SIZE = 4 * 1024 * 1024
+#: max bytes moved from ring to local reader buffer, keeps backpressure
+READER_CHUNK_SIZE = 64 * 1024
+#: max wait on the ring semaphores before rechecking (sec), e.g. for a
+#: producer process that died without closing the ring
+WAIT_INTERVAL = 0.5
+
+# ----------------------------------------------------------------------------
+
+
+class SharedRingBuffer:
+    """Single producer, multi consumer byte ring in shared memory.
+
+    Each reader has its own tail (fan-out, every reader sees the full
+    stream). Head and tails are total byte counters (not wrapped). Data
+    is copied without lock, head and tails are published under a
+    :func:`multiprocessing.Lock` (a memory barrier on any CPU): the
+    producer publishes the head after copying data in, a reader its
+    tail after copying data out. Waiting readers (empty ring) and the
+    waiting producer (full ring) sleep on semaphores, no polling.
+
+    Other processes get the ring as :class:`multiprocessing.Process`
+    argument (attaches the shared memory by name, shares the lock and
+    semaphores), not by name alone.
+    """
+
+    def __init__(self, size=DEFAULT_RING_SIZE, max_readers=4):
+        total = RING_HEADER.size + RING_READER.size * max_readers + size
+        self.shm = shared_memory.SharedMemory(create=True, size=total)
+        RING_HEADER.pack_into(self.shm.buf, 0, size, 0, 0, max_readers, 0, 0)
+        for idx in range(max_readers):
+            RING_READER.pack_into(self.shm.buf, self._reader_offset(idx), 0, 0, 0)
+        # unlink on close in the creating process only (fork copies it)
+        self._owner = os.getpid()
+        self.lock = multiprocessing.Lock()
+        self._data_ready = [multiprocessing.Semaphore(0) for _ in range(max_readers)]
+        self._space = multiprocessing.Semaphore(0)
+        self._attach()
+
+    def _attach(self):
+        capacity, _, _, max_readers, _, _ = RING_HEADER.unpack_from(self.shm.buf, 0)
+        self.capacity = capacity
+        self.max_readers = max_readers
+        data_start = RING_HEADER.size + RING_READER.size * max_readers
+        self.data = self.shm.buf[data_start : data_start + capacity]
+
+    def __getstate__(self):
+        # only while spawning a process (lock and semaphores)
+        return (self.shm.name, self.lock, self._data_ready, self._space)
+
+    def __setstate__(self, state):
+        name, self.lock, self._data_ready, self._space = state
+        self.shm = shared_memory.SharedMemory(name=name)
+        self._owner = None
+        self._attach()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @staticmethod
+    def _reader_offset(idx):
+        return RING_HEADER.size + RING_READER.size * idx
+
+    def _get(self, offset):
+        return struct.unpack_from("<Q", self.shm.buf, offset)[0]
+
+    def _set(self, offset, value):
+        struct.pack_into("<Q", self.shm.buf, offset, value)
+
+    @property
+    def head(self):
+        with self.lock:
+            return self._get(RING_OFF_HEAD)
+
+    @property
+    def closed(self):
+        with self.lock:
+            return bool(self._get(RING_OFF_CLOSED))
+
+    @property
+    def dropped(self):
+        with self.lock:
+            return self._get(RING_OFF_DROPPED)
+
+    def get_state(self):
+        """Reader: ``(head, closed)``, data up to head is readable."""
+        with self.lock:
+            return self._get(RING_OFF_HEAD), bool(self._get(RING_OFF_CLOSED))
+
+    def get_tail(self, idx):
+        with self.lock:
+            return self._get(self._reader_offset(idx))
+
+    def set_tail(self, idx, value):
+        """Reader: publish tail after copying data out, wake producer."""
+        with self.lock:
+            self._set(self._reader_offset(idx), value)
+            self._wake_writer()
+
+    def is_reader_active(self, idx):
+        with self.lock:
+            return bool(self._get(self._reader_offset(idx) + RING_OFF_READER_ACTIVE))
+
+    def set_reader_active(self, idx, active):
+        offset = self._reader_offset(idx)
+        with self.lock:
+            if active:
+                # start at current head, no old data
+                self._set(offset, self._get(RING_OFF_HEAD))
+            self._set(offset + RING_OFF_READER_ACTIVE, int(active))
+            self._wake_writer()
+
+    def _min_tail(self):
+        # lock held
+        tails = [
+            self._get(self._reader_offset(idx))
+            for idx in range(self.max_readers)
+            if self._get(self._reader_offset(idx) + RING_OFF_READER_ACTIVE)
+        ]
+        return min(tails) if tails else self._get(RING_OFF_HEAD)
+
+    def publish(self, head):
+        """Producer: publish head after copying data in, wake readers."""
+        with self.lock:
+            self._set(RING_OFF_HEAD, head)
+            self._wake_readers()
+
+    def add_dropped(self, size):
+        with self.lock:
+            self._set(RING_OFF_DROPPED, self._get(RING_OFF_DROPPED) + size)
+
+    def set_closed(self):
+        """Producer: end of stream, wake readers."""
+        with self.lock:
+            self._set(RING_OFF_CLOSED, 1)
+            self._wake_readers()
+
+    def _wake_readers(self):
+        # lock held
+        for idx in range(self.max_readers):
+            offset = self._reader_offset(idx) + RING_OFF_READER_WAITING
+            if self._get(offset):
+                self._set(offset, 0)
+                self._data_ready[idx].release()
+
+    def _wake_writer(self):
+        # lock held
+        if self._get(RING_OFF_WRITER_WAITING):
+            self._set(RING_OFF_WRITER_WAITING, 0)
+            self._space.release()
+
+    def wait_data(self, idx, tail, timeout):
+        """Reader: wait (at most timeout seconds) until head is past
+        tail or the ring is closed."""
+        offset = self._reader_offset(idx) + RING_OFF_READER_WAITING
+        with self.lock:
+            if self._get(RING_OFF_HEAD) != tail or self._get(RING_OFF_CLOSED):
+                return
+            self._set(offset, 1)
+        self._data_ready[idx].acquire(True, timeout)
+        with self.lock:
+            self._set(offset, 0)
+
+    def wait_space(self, end, timeout):
+        """Producer: True if all readers passed ``end - capacity``,
+        else wait (at most timeout seconds) for a reader, False if
+        still full."""
+        with self.lock:
+            if end - self._min_tail() <= self.capacity:
+                return True
+            if timeout is not None and timeout <= 0:
+                return False
+            self._set(RING_OFF_WRITER_WAITING, 1)
+        self._space.acquire(True, timeout)
+        with self.lock:
+            self._set(RING_OFF_WRITER_WAITING, 0)
+            return end - self._min_tail() <= self.capacity
+
+    def copy_in(self, pos, data):
+        pos %= self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.data[pos : pos + first] = data[:first]
+        if first < len(data):
+            self.data[: len(data) - first] = data[first:]
+
+    def copy_out(self, pos, size):
+        pos %= self.capacity
+        first = min(size, self.capacity - pos)
+        chunk = bytearray(self.data[pos : pos + first])
+        if first < size:
+            chunk += self.data[: size - first]
+        return chunk
+
+    def close(self):
+        self.data.release()
+        self.shm.close()
+        if self._owner == os.getpid():
+            self.shm.unlink()
+
+
+class ShmRingWriter:
+    """Producer side, register as RX sink of the USB reader
+    (``write(data, timestamp)``).
+
+    If the ring is full for block_timeout seconds (slowest reader
+    lagging), the packet is dropped and counted in the ring header."""
+
+    def __init__(self, ring, block_timeout=0.1):
+        self.ring = ring
+        self.block_timeout = block_timeout
+        self._head = ring.head
+
+    def write(self, data, timestamp=None):
+        ring = self.ring
+        size = len(data)
+        if size > ring.capacity:
+            raise ValueError("Data larger than ring buffer!")
+
+        with Timeout(self.block_timeout) as to:
+            while not ring.wait_space(self._head + size, to.time_left()):
+                if to.expired():
+                    ring.add_dropped(size)
+                    return 0
+
+        ring.copy_in(self._head, data)
+        self._head += size
+        # publish after copy
+        ring.publish(self._head)
+        return size
+
+    def close(self):
+        self.ring.set_closed()
+
+
+class ShmRingReader:
+    """Consumer side with the ``read``/``read_until`` API of
+    :class:`usblib.CP210xSerial`.
+
+    ring is the :class:`SharedRingBuffer` (passed to this process as
+    argument), reader_idx a free reader slot. Data is moved from the
+    shared ring into a local :class:`Buffer`, an empty ring is waited
+    on (semaphore), not polled."""
+
+    def __init__(self, ring, reader_idx=0):
+        self.ring = ring
+        self.reader_idx = reader_idx
+        self._buf = Buffer()
+        self.ring.set_reader_active(reader_idx, True)
+        self._tail = self.ring.get_tail(reader_idx)
+
+    @property
+    def is_open(self):
+        head, closed = self.ring.get_state()
+        return not closed or self._tail != head
+
+    def _fill(self):
+        # only called if more data is needed, so local buffer stays small
+        head, _ = self.ring.get_state()
+        size = min(head - self._tail, READER_CHUNK_SIZE)
+        if size <= 0:
+            return 0
+        self._buf.write(self.ring.copy_out(self._tail, size))
+        self._tail += size
+        # publish after copy
+        self.ring.set_tail(self.reader_idx, self._tail)
+        return size
+
+    def _wait(self, to):
+        """Fill local buffer or wait, returns False if no more data
+        can arrive (timeout, producer closed)."""
+        if self._fill():
+            return True
+        if to.expired() or self.ring.closed:
+            return False
+        delay = to.time_left()
+        delay = WAIT_INTERVAL if delay is None else min(delay, WAIT_INTERVAL)
+        self.ring.wait_data(self.reader_idx, self._tail, delay)
+        return True
+
+    def __len__(self):
+        head, _ = self.ring.get_state()
+        return len(self._buf) + head - self._tail
+
+    def read(self, size=-1, timeout=None):
+        """Read size bytes, see :meth:`usblib.CP210xSerial.read`."""
+        buf = self._buf
+        if not size or size <= 0:
+            while self._fill():
+                pass
+            return buf.read(size)
+
+        with Timeout(timeout) as to:
+            while len(buf) < size:
+                if not self._wait(to):
+                    break
+            return buf.read(size)
+
+    def read_until(self, expected=b"\n", size=None, timeout=None):
+        """Read until expected is found, see
+        :meth:`usblib.CP210xSerial.read_until`."""
+        if not size or size <= 0:
+            size = -1
+
+        buf = self._buf
+        with Timeout(timeout) as to:
+            while not buf.contains(expected):
+                if size > 0 and size <= len(buf):
+                    break
+                if not self._wait(to):
+                    break
+            return buf.read_until(expected, size)
+
+    def close(self):
+        self.ring.set_reader_active(self.reader_idx, False)
+
+
+# ----------------------------------------------------------------------------
+
+
+def usb_reader_process(fd, ring, baudRate=115200, stop_event=None):
+    """USB reader (process target), publish RX stream into shared ring.
+
+    The RX thread writes directly into the ring (RX sink), there is no
+    local RX buffer, so nothing else runs in this process."""
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    writer = ShmRingWriter(ring)
+    ser = CP210xSerial(device, baudRate=baudRate, buffer_rx=False)
+    ser.add_rx_sink(writer)
+    try:
+        ser.open(_async=True)
+        while stop_event is None or not stop_event.wait(0.5):
+            if stop_event is None:
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            ser.close()
+        finally:
+            # readers must see the ring closed in any case
+            writer.close()
+            ring.close()
+
+
+def start_usb_reader(fd, ring_size=DEFAULT_RING_SIZE, max_readers=4, baudRate=115200):
+    """Start USB reader process, returns ``(ring, process, stop_event)``.
+
+    Decoder processes get the ring as process argument and attach with
+    ``ShmRingReader(ring, idx)``, each with a distinct reader index <
+    max_readers."""
+    ring = SharedRingBuffer(size=ring_size, max_readers=max_readers)
+    stop_event = multiprocessing.Event()
+    proc = multiprocessing.Process(
+        target=usb_reader_process,
+        args=(fd, ring),
+        kwargs={"baudRate": baudRate, "stop_event": stop_event},
+        daemon=True,
+    )
+    proc.start()
+    return ring, proc, stop_event
+
+
+# ----------------------------------------------------------------------------
+
+
+BENCH_LINE = b"12, 3456, 1.2345\n"
+#: producer gaps are recorded after this start-up time (sec)
+BENCH_WARMUP = 0.5
+
+
+def _bench_decode(line):
+    # CPU heavy python parsing, like dso138mini
+    idx, x, y = line.decode("utf-8").rstrip().split(",")
+    return int(x.strip()), float(y.strip())
+
+
+def _bench_produce(writer, duration, rate, result):
+    # simulated USB reader, 64 byte packets at rate bytes/sec
+    stream = BENCH_LINE * 64
+    packets = [stream[i : i + 64] for i in range(0, len(stream), 64)]
+    interval = 64 / float(rate)
+    t_start = time.monotonic()
+    t_end = t_start + duration
+    num, gaps, t_last = 0, list(), t_start
+    due = t_start
+    while True:
+        now = time.monotonic()
+        if now - t_start >= BENCH_WARMUP:
+            # steady state, not process start-up
+            gaps.append(now - t_last)
+        t_last = now
+        if now >= t_end:
+            break
+        if now < due:
+            time.sleep(due - now)
+            continue
+        due += interval
+        num += writer.write(packets[num // 64 % len(packets)], now) or 0
+    result["produced"] = num
+    result["max_gap"] = max(gaps)
+    result["p99_gap"] = percentile(gaps, 99.9)
+
+
+def _bench_consume(reader, duration):
+    num = 0
+    t_end = time.monotonic() + duration
+    while time.monotonic() < t_end:
+        line = reader.read_until(b"\n", 1024, 0.1)
+        if line.endswith(b"\n"):
+            _bench_decode(line)
+        num += len(line)
+    return num
+
+
+def _bench_shm_producer(ring, duration, rate, queue):
+    writer = ShmRingWriter(ring, block_timeout=0)
+    result = dict()
+    _bench_produce(writer, duration, rate, result)
+    result["dropped"] = ring.dropped
+    writer.close()
+    ring.close()
+    queue.put(result)
+
+
+class _BenchInProcessReader:
+    # CP210xSerial read API over a local Buffer
+    def __init__(self):
+        self._buf_in = Buffer()
+        self._is_open = True
+
+    read_until = CP210xSerial.read_until
+
+
+def benchmark(duration=5.0, rate=1024 * 1024):
+    """Compare sustained throughput of an in-process producer thread
+    against a separate producer process with shared memory ring, both
+    with a CPU heavy line decoder. The producer simulates a USB reader
+    with rate bytes/sec. The max producer gap shows how long a USB
+    reader would have been stalled (e.g. by the GIL)."""
+    LOGGER.info("%s CPU(s), producer at %.1f kB/s", os.cpu_count(), rate / 1024.0)
+
+    # in-process, shared GIL
+    rd = _BenchInProcessReader()
+    result = dict()
+    thrd = threading.Thread(
+        target=_bench_produce, args=(rd._buf_in, duration, rate, result)
+    )
+    thrd.start()
+    consumed = _bench_consume(rd, duration)
+    thrd.join()
+    LOGGER.info(
+        "in-process: consumed %.1f kB/s, produced %.1f kB/s, producer gap"
+        " p99.9 %.2f ms, max %.1f ms",
+        consumed / duration / 1024,
+        result["produced"] / duration / 1024,
+        result["p99_gap"] * 1000,
+        result["max_gap"] * 1000,
+    )
+
+    # shared memory, separate processes
+    ring = SharedRingBuffer(max_readers=1)
+    reader = ShmRingReader(ring, 0)
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(
+        target=_bench_shm_producer, args=(ring, duration, rate, queue)
+    )
+    proc.start()
+    consumed = _bench_consume(reader, duration)
+    result = queue.get()
+    proc.join()
+    reader.close()
+    ring.close()
+    LOGGER.info(
+        "shared mem: consumed %.1f kB/s, produced %.1f kB/s, producer gap"
+        " p99.9 %.2f ms, max %.1f ms, dropped %s bytes",
+        consumed / duration / 1024,
+        result["produced"] / duration / 1024,
+        result["p99_gap"] * 1000,
+        result["max_gap"] * 1000,
+        result["dropped"],
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+
+    import sys
+
+    LOGGER.debug("args: %s", sys.argv)
+
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    benchmark(duration)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+
+import array
+import json
+import logging
+import struct
+import threading
+import time
+
+import usb.backend.libusb1 as libusb1
+
+from usblib import device_from_fd
+from usblib import percentile
+from usblib import CP210xSerial
+from usblib import CP210x_GET_COMM_STATUS
+from usblib import CP210x_SET_BAUDRATE
+from usblib import Timeout
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+#: frame: magic, sequence number, payload (from seq), checksum
+FRAME_MAGIC = 0xA5
+FRAME = struct.Struct("<BI10sB")
+FRAME_SIZE = FRAME.size
+
+DEFAULT_BAUDRATES = (115200, 460800, 921600)
+DEFAULT_TRANSFER_SIZES = (64, 512, 4096)
+
+# ----------------------------------------------------------------------------
+
+
+def make_frame(seq):
+    payload = bytes((seq + i) & 0xFF for i in range(10))
+    head = struct.pack("<BI10s", FRAME_MAGIC, seq & 0xFFFFFFFF, payload)
+    return head + bytes((sum(head) & 0xFF,))
+
+
+class FrameVerifier:
+    """Check sequence numbered frame stream, count lost frames and
+    corrupt (skipped) bytes, resync on the frame magic."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.expected = 0
+        self.frames = 0
+        self.lost = 0
+        self.corrupt_bytes = 0
+
+    def feed(self, data):
+        buf = self.buf
+        buf += data
+        pos = 0
+        while len(buf) - pos >= FRAME_SIZE:
+            magic, seq, payload, checksum = FRAME.unpack_from(buf, pos)
+            if (
+                magic != FRAME_MAGIC
+                or sum(buf[pos : pos + FRAME_SIZE - 1]) & 0xFF != checksum
+                or make_frame(seq)[5:-1] != payload
+            ):
+                # resync
+                pos += 1
+                self.corrupt_bytes += 1
+                continue
+            if seq > self.expected:
+                self.lost += seq - self.expected
+            self.expected = seq + 1
+            self.frames += 1
+            pos += FRAME_SIZE
+        del buf[:pos]
+
+
+# ----------------------------------------------------------------------------
+
+
+class LoopbackDevice:
+    """Simulated CP210x with TX->RX jumper, data is delayed according
+    to the configured baud rate (10 bits per char). Only implements
+    what :class:`CP210xSerial` uses."""
+
+    idVendor = 0x10C4
+    idProduct = 0xEA60
+
+    class _Endpoint:
+        def __init__(self, address):
+            self.bEndpointAddress = address
+            self.wMaxPacketSize = 64
+
+    class _Interface:
+        def endpoints(self):
+            return [LoopbackDevice._Endpoint(0x81), LoopbackDevice._Endpoint(0x01)]
+
+    class _Configuration:
+        def interfaces(self):
+            return [LoopbackDevice._Interface()]
+
+    class _Backend:
+        def claim_interface(self, dev, intf):
+            pass
+
+        def release_interface(self, dev, intf):
+            pass
+
+    class _Context:
+        handle = None
+
+    def __init__(self, baudRate=115200):
+        self.backend = LoopbackDevice._Backend()
+        self._ctx = LoopbackDevice._Context()
+        self.baudRate = baudRate
+        self.cond = threading.Condition()
+        # (time available, data)
+        self.line = list()
+        self.line_free = time.monotonic()
+
+    def configurations(self):
+        return [LoopbackDevice._Configuration()]
+
+    def ctrl_transfer(
+        self,
+        bmRequestType,
+        bRequest,
+        wValue=0,
+        wIndex=0,
+        data_or_wLength=None,
+        timeout=None,
+    ):
+        if bRequest == CP210x_SET_BAUDRATE:
+            self.baudRate = struct.unpack("<I", bytes(data_or_wLength))[0]
+        if bRequest == CP210x_GET_COMM_STATUS:
+            # ulAmountInOutQueue, bytes not yet sent on the line
+            with self.cond:
+                pending = self.line_free - time.monotonic()
+            pending = max(0, int(pending * self.baudRate / 10.0))
+            status = bytearray(len(data_or_wLength))
+            struct.pack_into("<I", status, 12, pending)
+            data_or_wLength[:] = array.array("B", status)
+            return len(data_or_wLength)
+        if bmRequestType & 0x80:
+            # device to host, all zero status
+            return len(data_or_wLength)
+        return 0
+
+    def write(self, endpoint, data, timeout=None):
+        data = bytes(data)
+        # device TX FIFO (640 bytes) full, USB side blocks
+        fifo_time = 640 * 10.0 / self.baudRate
+        delay = self.line_free - time.monotonic() - fifo_time
+        if delay > 0:
+            time.sleep(delay)
+        with self.cond:
+            now = time.monotonic()
+            self.line_free = max(self.line_free, now) + len(data) * 10.0 / self.baudRate
+            self.line.append((self.line_free, data))
+            self.cond.notify_all()
+        return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        size = size_or_buffer
+        if not isinstance(size, int):
+            size = len(size_or_buffer)
+
+        with self.cond, Timeout((timeout or 1000) / 1000.0) as to:
+            while True:
+                now = time.monotonic()
+                if self.line and self.line[0][0] <= now:
+                    break
+                if to.expired():
+                    raise libusb1.USBError("Operation timed out", errno=110)
+                delay = to.time_left()
+                if self.line:
+                    delay = min(delay, self.line[0][0] - now)
+                self.cond.wait(delay)
+
+            data = bytearray()
+            while self.line and self.line[0][0] <= now and len(data) < size:
+                due, chunk = self.line.pop(0)
+                num = size - len(data)
+                data += chunk[:num]
+                if num < len(chunk):
+                    self.line.insert(0, (due, chunk[num:]))
+
+        if isinstance(size_or_buffer, int):
+            return array.array("B", bytes(data))
+        size_or_buffer[: len(data)] = array.array("B", bytes(data))
+        return len(data)
+
+
+# ----------------------------------------------------------------------------
+
+
+def measure_throughput(ser, duration):
+    verifier = FrameVerifier()
+    stop = threading.Event()
+    sent = [0]
+
+    # keep only ~50ms of line data queued, so the test ends in time
+    max_queued = max(4096, ser.baudrate / 10.0 * 0.05)
+
+    def writer():
+        seq = 0
+        while not stop.is_set():
+            if len(ser._buf_out) > max_queued:
+                time.sleep(0.005)
+                continue
+            # batch of frames per write call
+            frames = [make_frame(seq + i) for i in range(64)]
+            seq += len(frames)
+            # blocking, a partial frame would count as corrupt
+            sent[0] += ser.writev(frames) // FRAME_SIZE
+        ser.drain(1.0)
+
+    ser._buf_in.clear()
+    thrd = threading.Thread(target=writer)
+    t_start = time.monotonic()
+    thrd.start()
+    t_end = t_start + duration
+    while time.monotonic() < t_end:
+        verifier.feed(ser.read(4096, 0.1))
+    stop.set()
+    thrd.join()
+    # collect the rest, until line quiet
+    t_last = time.monotonic()
+    while True:
+        data = ser.read(4096, 0.2)
+        if not data:
+            break
+        t_last = time.monotonic()
+        verifier.feed(data)
+    duration = t_last - t_start
+
+    # frames missing at the end are lost too
+    verifier.lost += max(0, sent[0] - verifier.expected)
+    return {
+        "duration": duration,
+        "frames_sent": sent[0],
+        "frames_received": verifier.frames,
+        "frames_lost": verifier.lost,
+        "corrupt_bytes": verifier.corrupt_bytes,
+        "throughput": verifier.frames * FRAME_SIZE / duration,
+    }
+
+
+def measure_latency(ser, count):
+    rtts = list()
+    lost = 0
+    ser._buf_in.clear()
+    for seq in range(count):
+        frame = make_frame(seq)
+        t_start = time.perf_counter()
+        ser.write(frame)
+        data = ser.read(FRAME_SIZE, 1.0)
+        rtt = time.perf_counter() - t_start
+        if bytes(data) != frame:
+            lost += 1
+            ser._buf_in.clear()
+            continue
+        rtts.append(rtt)
+
+    return {
+        "count": count,
+        "lost": lost,
+        "rtt_p50": percentile(rtts, 50),
+        "rtt_p90": percentile(rtts, 90),
+        "rtt_p99": percentile(rtts, 99),
+        "rtt_max": max(rtts) if rtts else None,
+    }
+
+
+def self_test(
+    ser,
+    baudrates=DEFAULT_BAUDRATES,
+    transfer_sizes=DEFAULT_TRANSFER_SIZES,
+    duration=3.0,
+    pings=100,
+):
+    """Sweep baud rates and RX transfer sizes on an open port with
+    TX->RX loopback, returns list of result dicts."""
+    results = list()
+    for baudRate in baudrates:
+        ser.set_baudRate(baudRate)
+        for transfer_size in transfer_sizes:
+            ser._thrd_buf_in.read_size = transfer_size
+            ser.purgeHWBuffer(True, True)
+            time.sleep(0.05)
+            LOGGER.info(
+                "Testing %s baud, transfer size %s ...", baudRate, transfer_size
+            )
+
+            result = {"baudrate": baudRate, "transfer_size": transfer_size}
+            result.update(measure_throughput(ser, duration))
+            result["line_rate"] = baudRate / 10.0
+            result["efficiency"] = result["throughput"] / result["line_rate"]
+            result["latency"] = measure_latency(ser, pings)
+            results.append(result)
+    return results
+
+
+def format_table(results):
+    def ms(value):
+        return "-" if value is None else "{:.2f}".format(value * 1000)
+
+    header = ("baud", "xfer", "B/s", "eff%", "lost", "corrupt")
+    header += ("p50 ms", "p90 ms", "p99 ms")
+    lines = ["{:>8} {:>6} {:>10} {:>6} {:>7} {:>7} {:>8} {:>8} {:>8}".format(*header)]
+    for res in results:
+        lat = res["latency"]
+        lines.append(
+            "{:>8} {:>6} {:>10.0f} {:>6.1f} {:>7} {:>7} {:>8} {:>8} {:>8}".format(
+                res["baudrate"],
+                res["transfer_size"],
+                res["throughput"],
+                res["efficiency"] * 100,
+                res["frames_lost"] + lat["lost"],
+                res["corrupt_bytes"],
+                ms(lat["rtt_p50"]),
+                ms(lat["rtt_p90"]),
+                ms(lat["rtt_p99"]),
+            )
+        )
+    return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------------
+
+
+def main(fd, simulate=False, json_file=None, **kwargs):
+    if simulate:
+        device = LoopbackDevice()
+    else:
+        device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    ser = CP210xSerial(device, baudRate=115200)
+    try:
+        ser.open(_async=True)
+        results = self_test(ser, **kwargs)
+    finally:
+        ser.close()
+
+    print(format_table(results))
+    if json_file:
+        with open(json_file, "w") as fp:
+            json.dump(results, fp, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.INFO)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Loopback (TX->RX) self-test.")
+    parser.add_argument("fd", nargs="?", type=int, help="USB fd (termux)")
+    parser.add_argument("--simulate", action="store_true", help="simulated device")
+    parser.add_argument("--bauds", type=int, nargs="+", default=DEFAULT_BAUDRATES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_TRANSFER_SIZES)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--pings", type=int, default=100)
+    parser.add_argument("--json", metavar="FILE", help="write JSON results to FILE")
+    args = parser.parse_args()
+
+    LOGGER.debug("args: %s", args)
+
+    main(
+        args.fd,
+        simulate=args.simulate,
+        json_file=args.json,
+        baudrates=args.bauds,
+        transfer_sizes=args.sizes,
+        duration=args.duration,
+        pings=args.pings,
+    )
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import time
+
+from usblib import device_from_fd
+from usblib import CP210xSerial
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------------
+
+
+def main(fd, num=2000):
+    device = device_from_fd(fd)
+
+    assert device.idVendor == 0x10C4 and device.idProduct == 0xEA60
+
+    # large TX buffer, measure API overhead not line rate
+    ser = CP210xSerial(device, baudRate=921600, tx_buffer_size=4 * 1024 * 1024)
+    try:
+        ser.open(_async=True)
+
+        writev_bench(ser, num)
+    finally:
+        ser.close()
+
+
+def make_messages(num, payload_size=200):
+    # header, payload memoryview, crc - like our protocol encoder
+    payload = memoryview(os.urandom(payload_size * num))
+    return [
+        (
+            b"\x02" + i.to_bytes(2, "little"),
+            payload[i * payload_size : (i + 1) * payload_size],
+            b"\xaa\x55",
+        )
+        for i in range(num)
+    ]
+
+
+def _bench(name, fn, messages, nbytes):
+    t_start = time.perf_counter()
+    for frags in messages:
+        fn(frags)
+    duration = time.perf_counter() - t_start
+    LOGGER.info(
+        "%-22s %8.1f us/msg, %8.1f kB/s",
+        name,
+        duration / len(messages) * 1e6,
+        nbytes / duration / 1024,
+    )
+
+
+def writev_bench(ser, num):
+    # small messages (call overhead) and large payloads (copy cost)
+    for payload_size, count in ((200, num), (64 * 1024, max(1, num // 100))):
+        LOGGER.info("%s messages, payload %s bytes:", count, payload_size)
+        messages = make_messages(count, payload_size)
+        nbytes = sum(len(f) for frags in messages for f in frags)
+
+        # threaded API, queue only (TX thread sends in background)
+        _bench("join + write", lambda f: ser.write(b"".join(f)), messages, nbytes)
+        ser.drain()
+        _bench("writev", ser.writev, messages, nbytes)
+        ser.drain()
+
+        # sync API, includes USB transfers
+        _bench(
+            "join + write_sync", lambda f: ser.write_sync(b"".join(f)), messages, nbytes
+        )
+        _bench("writev_sync", ser.writev_sync, messages, nbytes)
+
+
+if __name__ == "__main__":
+    # https://wiki.termux.com/wiki/Termux-usb
+    logging.basicConfig(
+        level=logging.INFO, format="[%(levelname).1s] %(name)s: %(message)s"
+    )
+    logging.getLogger(__name__).setLevel(logging.DEBUG)
+    logging.getLogger("usblib").setLevel(logging.DEBUG)
+    logging.getLogger("usblib.RXTX").setLevel(logging.INFO)
+
+    # grab fd number from args
+    #   (from termux wrapper)
+    import sys
+
+    LOGGER.debug("args: %s", sys.argv)
+
+    fd = int(sys.argv[1])
+    main(fd)